@@ -0,0 +1,107 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(REPO_DIR, 'models')]
+
+from baseline_model import BaselineBEPSModel
+from schema import COMPLIANCE_STATUS_DTYPE
+
+# Regression check of the baseline model's results on the real Seattle inputs, for the Jan and June proposals.
+# The model's totals by year and building counts by compliance status are compared against expected_results.json:
+#   python benchmarks/check_results.py
+# Each scenario is run three ways, which must all match: as is, with run length encoded results, and from cached inputs.
+#
+# The 'original' totals in expected_results.json are from the original implementation of the model, which calculated
+# one building and year at a time with DataFrame.apply (the baseline commit, 7 minutes a scenario). It lost the year of
+# every row of a few buildings and calculated their targets for the wrong year, so those buildings are listed as
+# excluded_buildings and left out of the original totals. Their totals in 'excluded' are from the fixed model,
+# so they pin its results without comparing them to the original.
+
+INPUT_DIR = os.path.join(REPO_DIR, 'data', 'input_data')
+EMISSIONS_PATH = os.path.join(INPUT_DIR, 'energy_emissions.csv')
+BUILDING_DATA_PATH = os.path.join(INPUT_DIR, 'Data cleaning', 'cleaned_building_data_with_policy_gfa.csv')
+START_YEAR, END_YEAR = 2027, 2050
+
+EXPECTED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'expected_results.json')
+
+# columns summed by year; compliance statuses are counted instead
+TOTAL_COLUMNS = ['expected_baseline', 'expected_baseline_ghgi', 'city_ghgi_target', 'compliant_ghgi', 'compliant_emissions', 'compliance_fees']
+
+def get_totals(panel, building_mask):
+    '''
+    Return the totals by year of TOTAL_COLUMNS and the number of buildings with each compliance status by year,
+    over the buildings in building_mask, as a dict of name to list
+    '''
+    totals = {col: panel[col][:, building_mask].sum(axis=1).tolist() for col in TOTAL_COLUMNS}
+    statuses = panel['compliance_status'][:, building_mask]
+    for code, status in enumerate(COMPLIANCE_STATUS_DTYPE.categories):
+        totals[status] = (statuses == code).sum(axis=1).tolist()
+    return totals
+
+def calculate_totals(scenario, run_length=False, cache_dir=None):
+    '''
+    Run a scenario and return its 'original' and 'excluded' totals, see get_totals
+    '''
+    model = BaselineBEPSModel(EMISSIONS_PATH, os.path.join(INPUT_DIR, scenario['timeline']), BUILDING_DATA_PATH, scenario['fine_years'], scenario['fine_per_sqft'], cache_dir=cache_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.calculate_baseline_model(START_YEAR, END_YEAR, lazy=True, run_length=run_length)
+
+    is_excluded = np.isin(model.results.ids, scenario['excluded_buildings'])
+    return {
+        'original': get_totals(model.results.panel, ~is_excluded),
+        'excluded': get_totals(model.results.panel, is_excluded),
+    }
+
+def compare(name, expected, totals, rtol):
+    '''
+    Print the totals that don't match the expected ones and return how many there are.
+    Sums of floats are compared with the relative tolerance rtol, building counts exactly.
+    '''
+    mismatches = 0
+    for part in ('original', 'excluded'):
+        for col, expected_values in expected[part].items():
+            expected_values, values = np.array(expected_values), np.array(totals[part][col])
+            if col in TOTAL_COLUMNS:
+                matches = np.isclose(values, expected_values, rtol=rtol, atol=0)
+            else:
+                matches = values == expected_values
+            for year, value, expected_value in zip(np.arange(START_YEAR, END_YEAR + 1)[~matches], values[~matches], expected_values[~matches]):
+                print(f'  {name} {part} {col} {year}: {value} != {expected_value}')
+            mismatches += int((~matches).sum())
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the baseline model\'s results against stored totals.')
+    parser.add_argument('--expected', default=EXPECTED_PATH, help='expected results file to compare against')
+    parser.add_argument('--rtol', type=float, default=1e-12, help='relative tolerance of the totals')
+    args = parser.parse_args()
+
+    with open(args.expected) as f:
+        scenarios = json.load(f)['scenarios']
+
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for name, scenario in scenarios.items():
+            print(f'checking {name}')
+            mismatches += compare(name, scenario, calculate_totals(scenario), args.rtol)
+            mismatches += compare(f'{name} (run length)', scenario, calculate_totals(scenario, run_length=True), args.rtol)
+
+            # the first run fills the cache, the second reads from it
+            calculate_totals(scenario, cache_dir=cache_dir)
+            mismatches += compare(f'{name} (cached)', scenario, calculate_totals(scenario, cache_dir=cache_dir), args.rtol)
+
+    if mismatches:
+        print(f'{mismatches} totals differ from {args.expected}')
+        sys.exit(1)
+    print('All totals match')
+
+if __name__ == '__main__':
+    main()
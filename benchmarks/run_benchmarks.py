@@ -0,0 +1,225 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(REPO_DIR, 'models'), os.path.join(REPO_DIR, 'utils'), os.path.dirname(os.path.abspath(__file__))]
+
+from alternative_compliance_model import AlternativeComplianceModel
+from baseline_model import BaselineBEPSModel
+from bst import find_reduction_percent
+from chunked_model import ChunkedBEPSModel
+from schema import COMPLIANCE_STATUS_DTYPE
+from synthetic_inventory import write_synthetic_inventory
+
+# Benchmarks of the model runs against the real Seattle inputs and synthetic inventories 10x, 100x and 1000x their size.
+# Wall time, peak memory and rows per second of each benchmark are written to a results file and compared against
+# a stored baseline, e.g.
+#   python benchmarks/run_benchmarks.py                   run everything and compare against benchmarks/baseline.json
+#   python benchmarks/run_benchmarks.py --scales 10       only the 10x synthetic inventory
+#   python benchmarks/run_benchmarks.py --save-baseline   store this run as the new baseline
+
+INPUT_DIR = os.path.join(REPO_DIR, 'data', 'input_data')
+EMISSIONS_PATH = os.path.join(INPUT_DIR, 'energy_emissions.csv')
+TIMELINE_PATH = os.path.join(INPUT_DIR, 'jan_proposal_emissions_targets.csv')
+BUILDING_DATA_PATH = os.path.join(INPUT_DIR, 'Data cleaning', 'cleaned_building_data_with_policy_gfa.csv')
+FINE_YEARS = [2027, 2030, 2035, 2040, 2045, 2050]
+FINE_PER_SQFT = 2.5
+START_YEAR, END_YEAR = 2027, 2050
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results.json')
+
+# inventories from this scale up are run in chunks, since their full panel doesn't fit in memory
+CHUNKED_SCALE = 1000
+
+def make_model(model_class=BaselineBEPSModel, building_data_path=BUILDING_DATA_PATH):
+    return model_class(EMISSIONS_PATH, TIMELINE_PATH, building_data_path, FINE_YEARS, FINE_PER_SQFT)
+
+# Each benchmark takes the inputs made by its setup and returns the number of rows (building x year) it calculated
+
+def run_baseline_model(building_data_path=BUILDING_DATA_PATH):
+    model = make_model(building_data_path=building_data_path)
+    model.calculate_baseline_model(START_YEAR, END_YEAR)
+    return len(model.scenario_results)
+
+def run_lazy_baseline_model(building_data_path=BUILDING_DATA_PATH):
+    model = make_model(building_data_path=building_data_path)
+    model.calculate_baseline_model(START_YEAR, END_YEAR, lazy=True)
+    model.get_total_emissions_by_year()
+    return model.results.panel['compliant_emissions'].size
+
+def run_alternative_compliance_model():
+    model = make_model(AlternativeComplianceModel)
+    model.calculate_alternative_compliance_model(START_YEAR, END_YEAR)
+    return len(model.scenario_results)
+
+def run_aggregates(model):
+    model.results.clear_cache()
+    model.get_total_emissions_by_year()
+    for year in range(START_YEAR, END_YEAR + 1):
+        model.get_percent_emissions_reduction_by_given_year(year)
+    return len(model.scenario_results)
+
+def run_reduction_search(output_dir, num_buildings):
+    # find_reduction_percent saves its timeline and results in the working directory
+    working_dir = os.getcwd()
+    os.chdir(output_dir)
+    try:
+        find_reduction_percent(2e8, 2035, TIMELINE_PATH, EMISSIONS_PATH, BUILDING_DATA_PATH, FINE_YEARS, FINE_PER_SQFT)
+    finally:
+        os.chdir(working_dir)
+    # the search and the saved results each cover every building in the target year
+    return num_buildings
+
+def run_chunked_model(building_data_path):
+    model = ChunkedBEPSModel(EMISSIONS_PATH, TIMELINE_PATH, building_data_path, FINE_YEARS, FINE_PER_SQFT, chunk_size=100000)
+    model.calculate_baseline_model(START_YEAR, END_YEAR)
+    # every building has one compliance status in each year
+    return int(model.aggregates_by_year[list(COMPLIANCE_STATUS_DTYPE.categories)].to_numpy().sum())
+
+def setup_aggregates():
+    model = make_model()
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.calculate_baseline_model(START_YEAR, END_YEAR)
+    return {'model': model}
+
+def setup_reduction_search(output_dir):
+    model = make_model()
+    model._prepare_input_data()
+    return {'output_dir': output_dir, 'num_buildings': len(model.buildings)}
+
+def get_benchmarks(scales, data_dir):
+    '''
+    Return a list of (name, setup, benchmark, repeat). setup returns the benchmark's keyword arguments and isn't timed.
+    '''
+    benchmarks = [
+        ('seattle/baseline_model', dict, run_baseline_model, 5),
+        ('seattle/baseline_model_lazy', dict, run_lazy_baseline_model, 5),
+        ('seattle/alternative_compliance_model', dict, run_alternative_compliance_model, 5),
+        ('seattle/aggregates', setup_aggregates, run_aggregates, 5),
+        ('seattle/bst_find_reduction_percent', lambda: setup_reduction_search(data_dir), run_reduction_search, 3),
+    ]
+
+    for scale in scales:
+        building_data_path = os.path.join(data_dir, f'synthetic_{scale}x.csv')
+
+        def setup(scale=scale, building_data_path=building_data_path):
+            if not os.path.exists(building_data_path):
+                print(f'  writing the {scale}x synthetic inventory to {building_data_path}')
+                write_synthetic_inventory(BUILDING_DATA_PATH, building_data_path, scale, seed=scale)
+            return {'building_data_path': building_data_path}
+
+        if scale >= CHUNKED_SCALE:
+            benchmarks.append((f'synthetic_{scale}x/chunked_model', setup, run_chunked_model, 1))
+        else:
+            benchmarks.append((f'synthetic_{scale}x/baseline_model', setup, run_baseline_model, 1))
+            benchmarks.append((f'synthetic_{scale}x/baseline_model_lazy', setup, run_lazy_baseline_model, 1))
+
+    return benchmarks
+
+def measure(benchmark, kwargs, repeat):
+    '''
+    Return the best wall time of repeat runs, the peak memory traced by tracemalloc in one more run, and the rows calculated.
+    Memory is traced in its own run, since tracing slows the benchmark down.
+    '''
+    wall_times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows = benchmark(**kwargs)
+        wall_times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        benchmark(**kwargs)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    wall_time = min(wall_times)
+    return {
+        'wall_time_s': wall_time,
+        'peak_memory_mb': peak_memory / 2 ** 20,
+        'rows': rows,
+        'rows_per_s': rows / wall_time if wall_time > 0 else None,
+    }
+
+def compare(results, baseline, tolerance, min_slowdown_s):
+    '''
+    Print each benchmark next to its baseline and return the names of the benchmarks that got slower or bigger than the tolerance allows.
+    Slowdowns under min_slowdown_s seconds don't count, since very short benchmarks are mostly timing noise.
+    '''
+    regressions = []
+    print(f'\n{"benchmark":45} {"wall s":>9} {"vs base":>8} {"peak MB":>9} {"vs base":>8} {"rows/s":>12}')
+    for name, result in results.items():
+        base = baseline.get(name)
+        time_ratio = result['wall_time_s'] / base['wall_time_s'] if base else np.nan
+        memory_ratio = result['peak_memory_mb'] / base['peak_memory_mb'] if base and base['peak_memory_mb'] else np.nan
+        print(f'{name:45} {result["wall_time_s"]:9.3f} {time_ratio:8.2f} {result["peak_memory_mb"]:9.1f} {memory_ratio:8.2f} {result["rows_per_s"] or 0:12.0f}')
+        slower = time_ratio > 1 + tolerance and result['wall_time_s'] - base['wall_time_s'] > min_slowdown_s
+        if slower or memory_ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the BEPS models and compare against a stored baseline.')
+    parser.add_argument('--scales', type=int, nargs='*', default=[10, 100, 1000], help='synthetic inventory sizes, as multiples of the real building data')
+    parser.add_argument('--only', help='only run benchmarks whose name contains this')
+    parser.add_argument('--data-dir', help='directory to keep the synthetic inventories in between runs, defaults to a temporary directory')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline results file to compare against')
+    parser.add_argument('--results', default=RESULTS_PATH, help='file to write this run\'s results to')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown or memory growth before a benchmark counts as a regression, e.g. 0.25 for 25%%')
+    parser.add_argument('--min-slowdown', type=float, default=0.025, help='smallest slowdown in seconds that counts as a regression')
+    parser.add_argument('--save-baseline', action='store_true', help='also save this run as the baseline')
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as stack:
+        data_dir = args.data_dir or stack.enter_context(tempfile.TemporaryDirectory())
+        os.makedirs(data_dir, exist_ok=True)
+
+        results = {}
+        for name, setup, benchmark, repeat in get_benchmarks(args.scales, data_dir):
+            if args.only and args.only not in name:
+                continue
+            print(f'running {name}')
+            results[name] = measure(benchmark, setup(), repeat)
+
+    run = {
+        'machine': {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__, 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'benchmarks': results,
+    }
+    with open(args.results, 'w') as f:
+        json.dump(run, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['benchmarks']
+    regressions = compare(results, baseline, args.tolerance, args.min_slowdown)
+
+    if args.save_baseline:
+        # keep the baseline for benchmarks that weren't run this time
+        with open(args.baseline, 'w') as f:
+            json.dump(dict(run, benchmarks=dict(baseline, **results)), f, indent=2)
+        print(f'\nSaved the baseline to {args.baseline}')
+
+    print(f'\nResults written to {args.results}')
+    if regressions:
+        print(f'Regressions beyond {args.tolerance:.0%}: {", ".join(regressions)}')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
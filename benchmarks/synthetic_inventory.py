@@ -0,0 +1,39 @@
+import pandas as pd
+import numpy as np
+
+# Synthetic building inventories for benchmarking, made by resampling the real building data so the mix of use types,
+# sq ft classifications and building types (and how they occur together) matches Seattle's
+
+ENERGY_USE_COLUMNS = ['Electricity(kBtu)', 'SteamUse(kBtu)', 'NaturalGas(kBtu)']
+
+def make_synthetic_inventory(building_data, num_buildings, seed=None, energy_use_sigma=0.1, first_id=1):
+    '''
+    Return num_buildings rows resampled from building_data, with new OSEBuildingIDs starting at first_id.
+    Each building's energy use is scaled by a mean one lognormal draw so the copies aren't identical.
+    '''
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(building_data), size=num_buildings)
+
+    inventory = building_data.iloc[rows].reset_index(drop=True)
+    inventory['OSEBuildingID'] = np.arange(first_id, first_id + num_buildings)
+
+    multipliers = np.exp(rng.normal(-energy_use_sigma ** 2 / 2, energy_use_sigma, size=(num_buildings, len(ENERGY_USE_COLUMNS))))
+    inventory[ENERGY_USE_COLUMNS] = inventory[ENERGY_USE_COLUMNS].to_numpy(dtype=float) * multipliers
+    return inventory
+
+def write_synthetic_inventory(building_data_path, output_path, scale, seed=None, chunk_scale=10):
+    '''
+    Write an inventory scale times the size of the building data to a CSV file, chunk_scale copies at a time
+    so the whole inventory is never in memory. Returns the number of buildings written.
+    '''
+    building_data = pd.read_csv(building_data_path).drop(columns='Unnamed: 0', errors='ignore')
+    chunk_size = len(building_data) * min(chunk_scale, scale)
+    num_buildings = len(building_data) * scale
+
+    seeds = np.random.SeedSequence(seed).spawn(-(-num_buildings // chunk_size))
+    for i, chunk_seed in enumerate(seeds):
+        first = i * chunk_size
+        chunk = make_synthetic_inventory(building_data, min(chunk_size, num_buildings - first), chunk_seed, first_id=first + 1)
+        chunk.to_csv(output_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+
+    return num_buildings
@@ -35,159 +35,146 @@ import numpy as np
 from baseline_model import BaselineBEPSModel
 
 class AlternativeComplianceModel(BaselineBEPSModel):
-    def __init__(self, emissions_path, timeline_path, building_data_path, fine_years, fine_per_sqft):
-        BaselineBEPSModel.__init__(self, emissions_path, timeline_path, building_data_path, fine_years, fine_per_sqft)
-        BaselineBEPSModel._load_input_data()
-        BaselineBEPSModel._clean_data()
+    # Alternative GHGITs as (first year of the compliance interval, fraction of the baseline GHGI), in order.
+    # Before the first interval an eligible building can stay at its baseline GHGI, and the last interval runs to the end of the model.
+    # Campuses use the nonresidential schedule.
+    ALTERNATIVE_GHGIT_SCHEDULES = {
+        'NonResidential': [(2027, 0.75), (2031, 0.5), (2036, 0.25), (2041, 0)],
+        'Multifamily': [(2031, 0.75), (2036, 0.5), (2041, 0.25), (2046, 0)],
+    }
 
-    def _eligible_for_exception_1(building_type):
+    # year the alternative GHGITs' baseline GHGI is taken from
+    BASELINE_YEAR = 2027
+
+    def __init__(self, emissions_path, timeline_path, building_data_path, fine_years, fine_per_sqft, cache_dir=None, baseline_years=None, baseline_window=None, use_type_shares_path=None):
+        BaselineBEPSModel.__init__(self, emissions_path, timeline_path, building_data_path, fine_years, fine_per_sqft, cache_dir, baseline_years, baseline_window, use_type_shares_path)
+
+    def _get_baseline_ghgis_in_year(self, year):
         '''
-            Determine if a building is eligible to use alternative compliance because it is part of a campus or building portfolio.
+            Return the expected baseline GHGI of every building in a single year, in building data order.
         '''
-        
-        # is campus
-        if building_type == 'Campus':
-            return True
+        _, _, _, baseline_ghgi = self._get_baseline_panel(year, year)
+        return baseline_ghgi[0]
 
+    def _eligible_for_exception_1(self, building_types):
+        '''
+            Determine which buildings are eligible to use alternative compliance because they are part of a campus or building portfolio.
+        '''
+        # is campus
         # TODO: is part of a portfolio
         # We don't have comprehensive data to assess this, so we're skipping for now
 
         # Connected buildings: we assume these are included in portfolios
-        
-        return False
-
-    def _eligible_for_exception_2(building, building_type):
-        '''
-            Determine if a building is eligible to use alternative compliance because >50% of its square footage has a use type not covered by the legislation.
-        '''
-        if building_type != 'NonResidential':
-            return False
-
-        # index of the largest use type that is NaN (no builidng type given in the dataset, presumed to be 'Other')
-        is_nan = list(building[['LargestPropertyUseType OSE', 'SecondLargestPropertyUseType OSE', 'ThirdLargestPropertyUseType OSE']]).index(np.nan) if np.nan in list(building[['LargestPropertyUseType OSE', 'SecondLargestPropertyUseType OSE', 'ThirdLargestPropertyUseType OSE']]) else -1
-
-        # index of the largest use type that is 'Other' (distinct from NaN)
-        is_other = list(building[['LargestPropertyUseType OSE', 'SecondLargestPropertyUseType OSE', 'ThirdLargestPropertyUseType OSE']]).index('Other') if 'Other' in list(building[['LargestPropertyUseType OSE', 'SecondLargestPropertyUseType OSE', 'ThirdLargestPropertyUseType OSE']]) else -1
-        
-        gfa_cols = ['percent_sqft_1st', 'percent_sqft_2nd', 'percent_sqft_3rd']
-        building_data_row = building_data[building_data['OSEBuildingID'] == building['OSEBuildingID']].iloc[0]
-        
-        if is_nan > -1 and (building_data_row[gfa_cols[is_nan]] > .5 or building_data_row[gfa_cols[is_other]] > .5):
-            return True
-        
-        return False
-
-    def _get_stand_benchmark_2035(building, baseline):
-        '''
-            Get the City's standard benchmark GHGI for a specific building.
-        '''
-        benchmarks_2035 = self.timeline.loc['2031-2035']
-        building_data_row = self.building_data[self.building_data['OSEBuildingID'] == building['OSEBuildingID']].iloc[0]
-        
-        if building['LargestPropertyUseType OSE'] == 'nan' or pd.isna(building['LargestPropertyUseType OSE']):
-            largest_ghgit = building_data_row['percent_sqft_1st'] * baseline
-        else:
-            largest_ghgit = building_data_row['percent_sqft_1st'] * benchmarks_2035[building['LargestPropertyUseType OSE']]
-            
-        if building['SecondLargestPropertyUseType OSE'] == 'nan' or pd.isna(building['SecondLargestPropertyUseType OSE']):
-            second_ghgit = building_data_row['percent_sqft_2nd'] * baseline
-        else:
-            second_ghgit = building_data_row['percent_sqft_2nd'] * benchmarks_2035[building['SecondLargestPropertyUseType OSE']]
-        
-        if building['ThirdLargestPropertyUseType OSE'] == 'nan' or pd.isna(building['ThirdLargestPropertyUseType OSE']):
-            third_ghgit = building_data_row['percent_sqft_3rd'] * baseline
-        else:
-            third_ghgit = building_data_row['percent_sqft_3rd'] * benchmarks_2035[building['ThirdLargestPropertyUseType OSE']]
-        
-        return largest_ghgit + second_ghgit + third_ghgit
-        
-    def _eligible_for_exception_3(building):
-        '''
-            Determine if a building is elibigle to use alternative compliance because it is a covered building that has a baseline GHGI greater than 3.5 times the covered building’s standard GHGIT for the 2031-2035 compliance interval
-        '''
-    
-        building_data_row = self.building_data[self.building_data['OSEBuildingID'] == building['OSEBuildingID']].iloc[0]
-        baseline_2035 = self.scenario_results[(self.scenario_results['year'] == 2035) & (self.scenario_results['OSEBuildingID'] == building['OSEBuildingID'])].iloc[0]['expected_baseline_ghgi']
-        
-        ghgit_2035 = self._get_stand_benchmark_2035(building, building_data, baseline_2035)
-        baseline_ghgi = self.scenario_results[(self.scenario_results['year'] == 2027) & (self.scenario_results['OSEBuildingID'] == building['OSEBuildingID'])].iloc[0]['expected_baseline_ghgi']
-        
+
+        return building_types == 'Campus'
+
+    def _eligible_for_exception_2(self, ids, building_types):
+        '''
+            Determine which buildings are eligible to use alternative compliance because >50% of their square footage has a use type not covered by the legislation.
+        '''
+        # use types that are NaN (no builidng type given in the dataset, presumed to be 'Other') or 'Other'
+        other_share = self.buildings.get_use_type_shares(ids, [np.nan, 'Other'])
+        return (building_types == 'NonResidential') & (other_share > .5)
+
+    def _get_stand_benchmark_2035(self, ids):
+        '''
+            Get the City's standard benchmark GHGI in 2035 for each building.
+        '''
+        years = np.array([[2035]])
+        baseline_2035 = self._get_baseline_ghgis_in_year(2035)
+        standards = self._get_use_type_standards(years, ids)
+        return self._get_city_ghgis(baseline_2035, standards)[0]
+
+    def _eligible_for_exception_3(self, ids, baseline_ghgi):
+        '''
+            Determine which buildings are elibigle to use alternative compliance because they are covered buildings with a baseline GHGI greater than 3.5 times the covered building’s standard GHGIT for the 2031-2035 compliance interval
+        '''
+        ghgit_2035 = self._get_stand_benchmark_2035(ids)
         return baseline_ghgi > ghgit_2035 * 3.5
 
-    def _can_use_alternative_ghgit(building):
-        building_type = self.building_data[self.building_data['OSEBuildingID'] == building['OSEBuildingID']].iloc[0]['Type_of_Bulding']
-
-        if self._eligible_for_exception_1(building_type):
-            return True
-        
-        if self._eligible_for_exception_2(building, building_type):
-            return True
-        
-        if self._eligible_for_exception_3(building):
-            return True
-        
-        return False
-
-    def _calc_alt_ghgi(building):
-        '''
-            Calculate expected emissions for a building in a given year under the alternative compliance policy.
-            Buildings not eligible for alternative GHGI return NA.
-
-            Input:
-                building: a row of data for a specific building in a specific year
-        '''
-        if not building['can_use_alternative_ghgi']:
-            return pd.NA
-        
-        baseline_ghgi = self.scenario_results[(self.scenario_results['year'] == 2027) & (self.scenario_results['OSEBuildingID'] == building['OSEBuildingID'])].iloc[0]['expected_baseline_ghgi']
-        year = building['year']
-        
-        if self.building_data[self.building_data['OSEBuildingID'] == building['OSEBuildingID']].iloc[0]['Type_of_Bulding'] == 'Multifamily':
-            if year < 2031:
-                return baseline_ghgi
-            if year >= 2031 and year <= 2035:
-                return 0.66 * baseline_ghgi
-            if year >= 2036 and year <= 2040:
-                return 0.33 * baseline_ghgi
-            if year > 2041 :
-                return 0
-        else:
-            if year >= 2027 and year <= 2030:
-                return baseline_ghgi
-            if year >= 2031 and year <= 2035:
-                return 0.75 * baseline_ghgi
-            if year >= 2036 and year <= 2040:
-                return 0.5 * baseline_ghgi
-            if year >= 2041 and year <= 2045:
-                return .25 * baseline_ghgi
-            if year > 2045:
-                return 0
-
-    def _choose_compliance(building):
-        '''
-            Determine the expected GHGI for a given building in a given year. 
-            Buildings eligible for alternative GHGI return the largest allowed GHGI for that building.
-            Buildings not eligible for alternative GHGI will return the regular compliant_ghgi.
-
-            Input: building: a row of data for a specific building in a specific year
-        '''
-        if pd.isna(building['alt_ghgi']):
-            return building['compliant_ghgi']
-        else:
-            return max(building['compliant_ghgi'], building['alt_ghgi'])
-
-    def _calc_alt_emissions(building):
-        return building['alt_compliance'] * building['Total GFA for Policy']
-    
-    def calculate_alternative_compliance_model():
-        scen_calcs = BaselineBEPSModel._calculate_baseline_model_without_saving(start_year, end_year)
-        self.scenario_results = scen_calcs
-
-        self.building_data['can_use_alternative_compliance'] = self.building_data.apply(lambda building: self.can_use_alternative_ghgit(building), axis=1)
-
-        self.scenario_results['alternative_ghgi'] = self.scenario_results.apply(lambda building: self._calc_alt_ghgi(building), axis=1)
-        self.scenario_results['alternative_compliant_ghgi'] = self.scenario_results.apply(lambda building: self._choose_compliance(building), axis=1)
-        # This is the expected emissions under the alternative compliance option
-        # For buildings not eligible for alternative GHGI, this will be the same as compliant_ghgi
-        self.scenario_results['alternative_compliant_emissions'] = self.scenario_results.apply(lambda building: self._calc_alt_emissions(building), axis=1)
-        
\ No newline at end of file
+    def _can_use_alternative_ghgit(self, ids, baseline_ghgi):
+        building_types = self.buildings.building_types(ids)
+
+        return self._eligible_for_exception_1(building_types) | self._eligible_for_exception_2(ids, building_types) | self._eligible_for_exception_3(ids, baseline_ghgi)
+
+    def _get_alternative_ghgit_fractions(self, years, building_types):
+        '''
+            Return the fraction of the baseline GHGI each building may emit in each year under the alternative GHGITs.
+            years broadcasts against building_types, e.g. a column of years gives year x building arrays.
+        '''
+        is_multifamily = building_types == 'Multifamily'
+        fractions = []
+        for schedule in (self.ALTERNATIVE_GHGIT_SCHEDULES['NonResidential'], self.ALTERNATIVE_GHGIT_SCHEDULES['Multifamily']):
+            first_years = np.array([first_year for first_year, _ in schedule])
+            schedule_fractions = np.array([1.0] + [fraction for _, fraction in schedule])
+            fractions.append(schedule_fractions[np.searchsorted(first_years, years, side='right')])
+
+        return np.where(is_multifamily, fractions[1], fractions[0])
+
+    def _calc_alt_ghgi(self, years, ids, can_use_alternative_ghgi, baseline_ghgi):
+        '''
+            Calculate the GHGI for each building in each year under the alternative compliance policy.
+            Buildings not eligible for alternative GHGI are NaN.
+        '''
+        fractions = self._get_alternative_ghgit_fractions(years, self.buildings.building_types(ids))
+        return np.where(can_use_alternative_ghgi, fractions * baseline_ghgi, np.nan)
+
+    def _choose_compliance(self, compliant_ghgi, alt_ghgi):
+        '''
+            Determine the expected GHGI for each building in each year.
+            Buildings eligible for alternative GHGI get the largest allowed GHGI for that building.
+            Buildings not eligible for alternative GHGI get the regular compliant_ghgi.
+        '''
+        return np.where(np.isnan(alt_ghgi), compliant_ghgi, np.fmax(compliant_ghgi, alt_ghgi))
+
+    def _calc_alt_emissions(self, alt_compliant_ghgi, gfa):
+        return alt_compliant_ghgi * gfa
+
+    def _calculate_alternative_compliance_panel(self, start_year, end_year):
+        '''
+        Returns the calculated years and a dict of column name to (year x building) array
+        '''
+        self._prepare_input_data()
+
+        years, ids, expected_baselines, baseline_ghgi = self._get_baseline_panel(start_year, end_year)
+        gfa = self.buildings.gfas(ids)
+        standards = self._get_use_type_standards(years, ids)
+
+        panel = {'expected_baseline': expected_baselines, 'expected_baseline_ghgi': baseline_ghgi}
+        panel.update(self._get_compliance_panel(ids, baseline_ghgi, standards))
+        panel['compliance_fees'] = self._get_noncompliance_fines(years, gfa)
+
+        with self._profile_stage('alternative_compliance') as stage:
+            # eligibility only depends on the building, so it is decided once per building
+            baseline_ghgi_2027 = self._get_baseline_ghgis_in_year(self.BASELINE_YEAR)
+            can_use_alternative_ghgi = self._can_use_alternative_ghgit(ids, baseline_ghgi_2027)
+            self.can_use_alternative_compliance = pd.Series(can_use_alternative_ghgi, index=pd.Index(ids, name='OSEBuildingID'))
+
+            alt_ghgi = self._calc_alt_ghgi(years, ids, can_use_alternative_ghgi, baseline_ghgi_2027)
+            panel['alternative_ghgi'] = alt_ghgi
+            panel['alternative_compliant_ghgi'] = self._choose_compliance(panel['compliant_ghgi'], alt_ghgi)
+            # This is the expected emissions under the alternative compliance option
+            # For buildings not eligible for alternative GHGI, this will be the same as compliant_emissions
+            panel['alternative_compliant_emissions'] = self._calc_alt_emissions(panel['alternative_compliant_ghgi'], gfa)
+            stage['rows'] = alt_ghgi.size
+
+        return years.ravel(), panel
+
+    def _calculate_alternative_compliance_model_without_saving(self, start_year, end_year):
+        years, panel = self._calculate_alternative_compliance_panel(start_year, end_year)
+        return self._make_panel_frame(self.building_data, years, panel)
+
+    def _calculate_model_without_saving(self, start_year, end_year):
+        return self._calculate_alternative_compliance_model_without_saving(start_year, end_year)
+
+    def calculate_alternative_compliance_model(self, start_year, end_year, lazy=False, run_length=False):
+        '''
+            start_year: year to begin calculations (inclusive)
+            end_year: year to end calculations (inclusive)
+            lazy: if True, don't build the scenario_results dataframe; totals are summed from model_name.results instead
+            run_length: if True, keep the columns that change rarely in model_name.results as runs of years, see calculate_baseline_model
+        '''
+        years, panel = self._calculate_alternative_compliance_panel(start_year, end_year)
+        self._save_results(years, panel, lazy, run_length)
+        # the alternative columns aren't in the dependency graph, so input changes can't be applied in place
+        self._panel = None
@@ -0,0 +1,72 @@
+import pandas as pd
+import numpy as np
+
+# Baselines from several years of benchmarking data.
+# A long format building data table has one row per building and DataYear, e.g. the cleaned building data for
+# 2016-2023 concatenated together. average_energy_use turns it into one row per building with its baseline energy use,
+# which the models use in place of a single year's energy use.
+
+ENERGY_USE_COLUMNS = ['Electricity(kBtu)', 'SteamUse(kBtu)', 'NaturalGas(kBtu)']
+
+METHODS = ['mean', 'median']
+
+def _group_starts(codes):
+    '''
+    Return the position each group starts at in sorted group codes
+    '''
+    return np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+
+def average_energy_use(building_data, baseline_years=None, window=None, min_years=1, method='mean'):
+    '''
+    Return one row per building with its baseline energy use, from building data with a row for each year a building reported.
+
+    Each building's row is its most recently reported row, with the energy use columns replaced by the mean (or median)
+    over the years used for its baseline, DataYear set to the most recent of those years and a
+    'Baseline years reported' column with how many years were used. Years a building didn't report are skipped, so
+    its baseline is over the years it did report; rows without any energy use reported count as missing years.
+    If a building has more than one row for a year, the last one is used.
+
+    baseline_years: optional (first year, last year) to take the baseline from, inclusive
+    window: optional number of years to use: each building's most recently reported years within baseline_years
+    min_years: buildings that reported fewer years than this are dropped
+    method: 'mean' or 'median'
+    '''
+    if method not in METHODS:
+        raise ValueError(f'method must be one of {", ".join(METHODS)}, got {method!r}')
+
+    reported = building_data[ENERGY_USE_COLUMNS].notna().any(axis=1).to_numpy()
+    years = building_data['DataYear'].to_numpy()
+    if baseline_years is not None:
+        first_year, last_year = baseline_years
+        reported = reported & (years >= first_year) & (years <= last_year)
+    building_data = building_data[reported].drop_duplicates(['OSEBuildingID', 'DataYear'], keep='last')
+
+    # sort by building, newest year first, so each building's rows are contiguous and start with its latest year
+    codes, _ = pd.factorize(building_data['OSEBuildingID'])
+    years = building_data['DataYear'].to_numpy()
+    order = np.lexsort((-years, codes))
+    codes = codes[order]
+    starts = _group_starts(codes)
+    if window is not None:
+        rank = np.arange(len(codes)) - np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+        order = order[rank < window]
+        codes = codes[rank < window]
+        starts = _group_starts(codes)
+    counts = np.diff(np.r_[starts, len(codes)])
+
+    energy_use = building_data[ENERGY_USE_COLUMNS].fillna(0).to_numpy(dtype=float)[order]
+    if method == 'mean':
+        baseline = np.add.reduceat(energy_use, starts, axis=0) / counts[:, np.newaxis] if len(codes) else energy_use
+    else:
+        baseline = pd.DataFrame(energy_use).groupby(codes, sort=True).median().to_numpy()
+
+    averaged = building_data.iloc[order[starts]].copy()
+    averaged[ENERGY_USE_COLUMNS] = baseline
+    averaged['Baseline years reported'] = counts
+    return averaged[counts >= min_years]
+
+def has_multiple_years(building_data):
+    '''
+    Return whether the building data has more than one row for any building, i.e. is in long format
+    '''
+    return 'DataYear' in building_data.columns and building_data['OSEBuildingID'].duplicated().any()
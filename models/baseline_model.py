@@ -1,38 +1,172 @@
+import contextlib
+
 import pandas as pd
 import numpy as np
 
+from baseline_energy_use import average_energy_use, has_multiple_years
+from building_store import BuildingStore
+from compliance_events import ComplianceEvents
+from data_cache import DataCache
+from ghgi_target_index import GHGITargetIndex
+from result_writers import PartitionedResultWriter, SummaryCSVWriter
+from run_length_results import RunLengthResults
+from scenario_results import ScenarioResults
+from stage_profiler import StageProfiler
+from schema import ID_DTYPE, YEAR_DTYPE, apply_building_schema, apply_timeline_schema, make_compliance_statuses, make_dimension_dtypes
+
 class BaselineBEPSModel:
-    def __init__(self, emissions_path, timeline_path, building_data_path, fine_years, fine_per_sqft):
+    # StageProfiler recording each stage of the model's runs, see enable_profiling
+    profile = None
+
+    def __init__(self, emissions_path, timeline_path, building_data_path, fine_years, fine_per_sqft, cache_dir=None, baseline_years=None, baseline_window=None, use_type_shares_path=None):
         '''
         emissions_path: file path to table of energy emissions factors for each year
         timeline_path: file path for proposed timeline of emissions reduction
         building_data_path: file path for buildings data
         fine_years: array of years where building owners can be fined for not being compliant
         fine_per_sqft: per square foot fee for non-compliance
+        cache_dir: optional directory to cache the loaded and cleaned input tables in, so later models skip parsing the CSVs
+        baseline_years: optional (first year, last year) to average each building's energy use over, for building data with several DataYears per building
+        baseline_window: optional number of each building's most recently reported years to average over
+        use_type_shares_path: optional file path for a long format table of building use types and shares of GFA
+            (see BuildingStore.USE_TYPE_SHARE_COLUMNS), for buildings with more use types than the building data's three
         '''
         self.emissions_path = emissions_path
         self.timeline_path = timeline_path
         self.building_data_path = building_data_path
         self.fine_years = fine_years
         self.fine_per_sqft = fine_per_sqft
+        self.cache = DataCache(cache_dir) if cache_dir is not None else None
+        self.baseline_years = baseline_years
+        self.baseline_window = baseline_window
+        self.use_type_shares_path = use_type_shares_path
+
+    # Profiling
+
+    def enable_profiling(self, trace_memory=True, snapshot_dir=None):
+        '''
+        Record the wall time, rows and peak memory of each stage of this model's runs in model_name.profile,
+        e.g. model_name.profile.summary() or model_name.profile.to_json('profile.json')
+
+        trace_memory: also record each stage's peak memory with tracemalloc, which slows the run down
+        snapshot_dir: optional directory to dump a tracemalloc snapshot to after each stage
+        '''
+        self.profile = StageProfiler(trace_memory, snapshot_dir)
+        return self.profile
+
+    def disable_profiling(self):
+        '''
+        Stop recording stages. Returns the profile recorded so far.
+        '''
+        profile = self.profile
+        if profile is not None:
+            profile.stop()
+        self.profile = None
+        return profile
+
+    def _profile_stage(self, name):
+        '''
+        Context manager for a stage of the run that yields a dict to record the stage's rows in. Does nothing unless profiling is enabled.
+        '''
+        if self.profile is None:
+            return contextlib.nullcontext({})
+        return self.profile.stage(name)
 
     # Loading data
     
+    def _load_cached_table(self, name, path):
+        '''
+        Return the cached copy of a loaded input table, or None if there is no cache or the file isn't cached yet.
+        '''
+        if self.cache is None:
+            return None
+        return self.cache.load(name, path)
+
+    def _save_cached_table(self, name, path, table):
+        if self.cache is not None:
+            self.cache.save(name, path, table)
+
     def _load_timeline_data(self):
-        self.timeline = pd.read_csv(self.timeline_path)
+        with self._profile_stage('load_timeline') as stage:
+            timeline = self._load_cached_table('timeline', self.timeline_path)
+            if timeline is None:
+                timeline = pd.read_csv(self.timeline_path)
+                self._save_cached_table('timeline', self.timeline_path, timeline)
+
+            self.timeline = timeline
+            self.ghgi_targets = GHGITargetIndex(self.timeline)
+            stage['rows'] = len(timeline)
 
     def _load_building_data(self):
-        self.building_data = pd.read_csv(self.building_data_path)
+        with self._profile_stage('load_building_data') as stage:
+            # the building data is cached after cleaning, so a cached copy doesn't need to be cleaned again
+            self.building_data = self._load_cached_table(self._building_data_cache_name(), self.building_data_path)
+            self._building_data_is_clean = self.building_data is not None
+            if self.building_data is None:
+                self.building_data = pd.read_csv(self.building_data_path)
+            stage['rows'] = len(self.building_data)
+            if not self._building_data_is_clean:
+                self._average_energy_use()
+
+    def _building_data_cache_name(self):
+        # building data averaged over different years is cached separately
+        if self.baseline_years is None and self.baseline_window is None:
+            return 'building_data'
+        first_year, last_year = self.baseline_years or ('', '')
+        return f'building_data-{first_year}-{last_year}-{self.baseline_window or ""}'
+
+    def _average_energy_use(self):
+        '''
+        Replace building data with several years per building with each building's baseline energy use, see baseline_energy_use.average_energy_use
+        '''
+        if self.baseline_years is None and self.baseline_window is None and not has_multiple_years(self.building_data):
+            return
+        self.building_data = average_energy_use(self.building_data, self.baseline_years, self.baseline_window)
+
+    def _load_use_type_shares(self):
+        self.use_type_shares = None
+        if self.use_type_shares_path is None:
+            return
+
+        with self._profile_stage('load_use_type_shares') as stage:
+            use_type_shares = self._load_cached_table('use_type_shares', self.use_type_shares_path)
+            if use_type_shares is None:
+                use_type_shares = pd.read_csv(self.use_type_shares_path)
+                self._save_cached_table('use_type_shares', self.use_type_shares_path, use_type_shares)
+
+            self.use_type_shares = use_type_shares
+            stage['rows'] = len(use_type_shares)
 
     def _load_emissions_data(self):
-        emissions = pd.read_csv(self.emissions_path)
-        emissions.set_index('Year', inplace=True)
-        self.energy_emissions = emissions
+        with self._profile_stage('load_emissions') as stage:
+            emissions = self._load_cached_table('energy_emissions', self.emissions_path)
+            if emissions is None:
+                emissions = pd.read_csv(self.emissions_path)
+                emissions.set_index('Year', inplace=True)
+                self._save_cached_table('energy_emissions', self.emissions_path, emissions)
+
+            self.energy_emissions = emissions
+            stage['rows'] = len(emissions)
+
+    def _apply_dtype_schema(self):
+        '''
+        Give the building data and timeline compact dtypes, with use types and sq ft classifications as shared categoricals.
+        '''
+        with self._profile_stage('apply_dtype_schema') as stage:
+            timeline = getattr(self, 'timeline', None)
+            dimension_dtypes = make_dimension_dtypes(self.building_data, timeline)
+
+            self.building_data = apply_building_schema(self.building_data, dimension_dtypes)
+            if timeline is not None:
+                self.timeline = apply_timeline_schema(timeline, dimension_dtypes)
+            stage['rows'] = len(self.building_data)
 
     def _load_input_data(self):
         self._load_timeline_data()
         self._load_building_data()
+        self._load_use_type_shares()
         self._load_emissions_data()
+        self._apply_dtype_schema()
 
     # Cleaning data
 
@@ -44,134 +178,536 @@ class BaselineBEPSModel:
         self.building_data = self.building_data[(self.building_data['Electricity(kBtu)'] > 0) | (self.building_data['NaturalGas(kBtu)'] > 0) | (self.building_data['SteamUse(kBtu)'] > 0)]
 
     def _clean_data(self):
-        self._filter_out_small_buildings()
-        self._filter_out_buildings_without_energy_use()
+        with self._profile_stage('clean_data') as stage:
+            if not self._building_data_is_clean:
+                self._filter_out_small_buildings()
+                self._filter_out_buildings_without_energy_use()
+                self._save_cached_table(self._building_data_cache_name(), self.building_data_path, self.building_data)
+                self._building_data_is_clean = True
+
+            self.buildings = BuildingStore(self.building_data, self.use_type_shares)
+            self._target_scale_panels = {}
+            stage['rows'] = len(self.building_data)
 
     # Calculating the baseline model
-    
-    def _find_ghgi_standard(self, year, building_type, sq_ft_class):
+
+    def _find_ghgi_standards(self, years, building_types, sq_ft_classes, ghgi_targets=None):
         '''
-        Find the GHGI standard in the model's timeline for a given year, building type, and building size.
+        Find the GHGI standard in a timeline for arrays of years, building types, and building sizes.
+        The arrays broadcast against each other, e.g. a column of years and a row of buildings gives a year x building array.
+        Returns an array of standards, with NaN where the timeline has no standard yet.
+
+        ghgi_targets: GHGITargetIndex to look the standards up in, defaults to the model's timeline
         '''
+        if ghgi_targets is None:
+            ghgi_targets = self.ghgi_targets
+
+        building_types = np.asarray(building_types, dtype=object)
+        ghgi = ghgi_targets.lookup(years, sq_ft_classes, building_types)
+
         # building types listed as NAN don't count towards the policy, so their emissions and sq ft are calculated as zero
-        if pd.isna(building_type) or building_type == 'nan':
-            return 0
+        no_building_type = pd.isna(building_types) | (building_types == 'nan')
+        ghgi[np.broadcast_to(no_building_type, ghgi.shape)] = 0
 
-        row = self.timeline[(self.timeline['year'] == year) & (self.timeline['sq_ft_classification'] == sq_ft_class) & (self.timeline['building_type'] == building_type)]
-        return row.iloc[0]['ghgi'] if len(row) > 0 else np.nan
-    
-    def _get_expected_baseline(self, building, year):
+        return ghgi
+
+    # Energy use columns in the building data and the matching emission factor columns in the emissions data
+    ENERGY_USE_COLUMNS = ['Electricity(kBtu)', 'SteamUse(kBtu)', 'NaturalGas(kBtu)']
+    EMISSION_FACTOR_COLUMNS = ['Electricity emission factor (kgCO2e/kBtu)', 'Steam emission factor (kgCO2e/kBtu)', 'Gas emission factor (kgCO2e/kBtu)']
+
+    # Building data columns added to scenario_results by get_scenario_results_with_building_info
+    BUILDING_INFO_COLUMNS = ['OSEBuildingID', 'BuildingName', 'Total GFA for Policy', 'sq_ft_classification', 'LargestPropertyUseType OSE', 'SecondLargestPropertyUseType OSE', 'ThirdLargestPropertyUseType OSE']
+
+    def _get_expected_baseline_matrix(self, buildings, years):
         '''
-        Find the expected baseline GHGE for a given year if the building makes no changes
+        Find the expected baseline GHGE for every building in every year if the buildings make no changes.
+        Returns a (buildings x years) array: the buildings' energy use (N x 3) times the emission factors (3 x Y).
         '''
-        electric_emissions = building['Electricity(kBtu)'] * self.energy_emissions.loc[year]['Electricity emission factor (kgCO2e/kBtu)']
-        steam_emissions = building['SteamUse(kBtu)'] * self.energy_emissions.loc[year]['Steam emission factor (kgCO2e/kBtu)']
-        gas_emissions = building['NaturalGas(kBtu)'] * self.energy_emissions.loc[year]['Gas emission factor (kgCO2e/kBtu)']
-        return electric_emissions + steam_emissions + gas_emissions
-    
-    def _get_expected_baseline_ghgi(self, building):
+        energy_use = buildings[self.ENERGY_USE_COLUMNS].to_numpy(dtype=float)
+        emission_factors = self.energy_emissions.loc[years, self.EMISSION_FACTOR_COLUMNS].to_numpy(dtype=float)
+
+        # summed one energy source at a time so the result matches electric + steam + gas exactly
+        expected_baselines = np.zeros((len(energy_use), len(emission_factors)))
+        for i in range(len(self.ENERGY_USE_COLUMNS)):
+            expected_baselines += np.outer(energy_use[:, i], emission_factors[:, i])
+        return expected_baselines
+
+    def _get_expected_baseline_ghgis(self, expected_baselines, gfa):
         '''
-        Return the expected GHGI for a bulding if the building makes no changes
+        Return the expected GHGI for every building if the buildings make no changes
         '''
-        if building['Total GFA for Policy'] == 0:
-            return 0
+        expected_baselines, gfa = np.broadcast_arrays(expected_baselines, gfa)
 
-        return building['expected_baseline'] / building['Total GFA for Policy']
-    
-    def _fill_in_expected_baselines(self, year_low, year_high, input_df, output_df):
+        ghgi = np.zeros(expected_baselines.shape)
+        np.divide(expected_baselines, gfa, out=ghgi, where=gfa != 0)
+        return ghgi
+
+    def _make_panel_frame(self, input_df, years, panel):
         '''
-        input_df: dataframe without any calculations, only building data
-        output_df: df with OSE ID, building name, total sq ft, sq ft classification, year, and expected baseline for each year in between year_low and year_high
+        Flatten (year x building) arrays into a dataframe with one row per building per year, grouped by year.
+        Rows only carry the building's OSEBuildingID; see get_scenario_results_with_building_info for the descriptive columns.
+
+        input_df: building data, in the same order as the panel's buildings
+        panel: dict of column name to (year x building) array
         '''
-        for year in range(year_low, year_high + 1):
-            temp_df = input_df[['OSEBuildingID', 'BuildingName', 'Total GFA for Policy', 'sq_ft_classification', 'LargestPropertyUseType OSE', 'SecondLargestPropertyUseType OSE', 'ThirdLargestPropertyUseType OSE']]
-            temp_df['year'] = pd.Series([year]*len(temp_df))
-            temp_df['expected_baseline'] = input_df.apply(lambda building: self._get_expected_baseline(building, year), axis=1)
+        with self._profile_stage('build_frame') as stage:
+            output = {
+                'OSEBuildingID': np.tile(input_df['OSEBuildingID'].to_numpy(dtype=ID_DTYPE), len(years)),
+                'year': np.repeat(np.asarray(years, dtype=YEAR_DTYPE), len(input_df)),
+            }
+            for col, values in panel.items():
+                output[col] = make_compliance_statuses(values) if col == 'compliance_status' else values.ravel()
 
-            output_df = pd.concat([output_df, temp_df])
+            stage['rows'] = len(output['year'])
+            return pd.DataFrame(output, index=np.tile(input_df.index.to_numpy(), len(years)))
 
+    def _get_use_type_standards(self, years, ids, ghgi_targets=None):
+        '''
+        Return the GHGI standards of the buildings' use types as UseTypeStandards, with one column per use type listed.
+        The timeline is looked up once per (sq ft classification, use type) key and year and gathered onto the buildings'
+        sparse use type weights, so buildings can list any number of use types.
+        years is a column or row of years; the standards have one row per year.
+        '''
+        with self._profile_stage('target_lookup') as stage:
+            weights = self.buildings.use_type_weights
+            key_standards = self._find_ghgi_standards(np.ravel(years), weights.key_use_types[:, np.newaxis], weights.key_sq_ft_classes[:, np.newaxis], ghgi_targets)
+            standards = weights.standards(key_standards, self.buildings.positions(ids))
+            stage['rows'] = standards.standards.size
+        return standards
 
-        return output_df
-    
-    def _get_city_ghgi(self, building):
-        year = building['year']
-        baseline_ghgi = building['expected_baseline_ghgi']
-        orig_building_row = self.building_data[self.building_data['OSEBuildingID'] == building['OSEBuildingID']].iloc[0]
+    def _get_city_ghgis(self, baseline_ghgi, standards):
+        '''
+        Blend the standards for each use type by its share of the building's GFA.
+        Use types with no standard yet are held to the building's expected baseline GHGI.
+        '''
+        return standards.get_city_ghgis(baseline_ghgi)
 
-        first_use_ghgi = self._find_ghgi_standard(year, orig_building_row['LargestPropertyUseType OSE'], building['sq_ft_classification'])
-        second_use_ghgi = self._find_ghgi_standard(year, orig_building_row['SecondLargestPropertyUseType OSE'], building['sq_ft_classification'])
-        third_use_ghgi = self._find_ghgi_standard(year, orig_building_row['ThirdLargestPropertyUseType OSE'], building['sq_ft_classification'])
+    def _get_compliant_ghgis(self, baseline_ghgi, city_ghgi):
+        '''
+        Return the lower of: the city's benchmark and the expected emissions for each building
+        '''
+        return np.where(city_ghgi < baseline_ghgi, city_ghgi, baseline_ghgi)
 
-        return (orig_building_row['LargestPropertyUseType Percent GFA'] * (baseline_ghgi if pd.isna(first_use_ghgi) else first_use_ghgi)) + (orig_building_row['SecondLargestPropertyUseType Percent GFA'] * (baseline_ghgi if pd.isna(second_use_ghgi) else second_use_ghgi)) + (orig_building_row['ThirdLargestPropertyUseType Percent GFA'] * (baseline_ghgi if pd.isna(third_use_ghgi) else third_use_ghgi))
+    def _get_compliant_emissions(self, compliant_ghgi, gfa):
+        return compliant_ghgi * gfa
+
+    def _get_compliance_statuses(self, baseline_ghgi, city_ghgi, standards):
+        '''
+        Return compliance status codes: 0 for Not due yet, 1 for Yes and 2 for No (see schema.COMPLIANCE_STATUS_DTYPE)
+        '''
+        not_due = ~standards.is_due()
+        is_compliant = baseline_ghgi < city_ghgi
+        return np.where(not_due, 0, np.where(is_compliant, 1, 2)).astype(np.int8)
 
-    def _get_compliant_ghgi(self, building):
+    def _get_noncompliance_fines(self, years, gfa, fine_years=None, fine_per_sqft=None):
         '''
-        Return the lower of: the city's benchmark and the expected emissions for a building
+        Return the fine for each building in each year, the building's GFA times the per square foot fee in fine years.
+        years broadcasts against gfa, e.g. a column of years gives year x building arrays.
         '''
-        return min(building['expected_baseline_ghgi'], building['city_ghgi_target'])
+        with self._profile_stage('fees') as stage:
+            fine_years = self.fine_years if fine_years is None else fine_years
+            fine_per_sqft = self.fine_per_sqft if fine_per_sqft is None else fine_per_sqft
 
-    def _get_compliant_emissions(self, building):
-        return building['compliant_ghgi'] * building['Total GFA for Policy']
+            is_fine_year = np.isin(np.asarray(years, dtype=float), np.asarray(fine_years, dtype=float))
+            fines = np.where(is_fine_year, gfa * fine_per_sqft, 0)
+            stage['rows'] = fines.size
+        return fines
 
-    def _get_compliance_status(self, building):
-        year = building['year']
-        sqft_class = building['sq_ft_classification']
-        if pd.isna(self._find_ghgi_standard(year, building['LargestPropertyUseType OSE'], sqft_class)) and pd.isna(self._find_ghgi_standard(year, building['SecondLargestPropertyUseType OSE'], sqft_class)) and pd.isna(self._find_ghgi_standard(year, building['ThirdLargestPropertyUseType OSE'], sqft_class)): 
-            return 'Not due yet'
-        elif building['expected_baseline_ghgi'] < building['city_ghgi_target']:
-            return 'Yes'
-        else:
-            return 'No'
-        
-    def _get_noncompliance_fines(self, building):
-        if building['year'] in self.fine_years:
-            return building['Total GFA for Policy'] * self.fine_per_sqft
-        else:
-            return 0
+    def _get_compliance_panel(self, ids, baseline_ghgi, standards):
+        '''
+        Calculate targets, compliant emissions and compliance status from the buildings' expected baseline GHGI.
+
+        ids: OSEBuildingIDs, one per column of baseline_ghgi
+        standards: blended standards from _get_use_type_standards; may have extra leading dimensions (e.g. one per scenario)
+        Returns a dict of column name to array
+        '''
+        with self._profile_stage('compliance') as stage:
+            gfa = self.buildings.gfas(ids)
+
+            city_ghgi = self._get_city_ghgis(baseline_ghgi, standards)
+            compliant_ghgi = self._get_compliant_ghgis(baseline_ghgi, city_ghgi)
+            stage['rows'] = city_ghgi.size
+
+            return {
+                'city_ghgi_target': city_ghgi,
+                'compliant_ghgi': compliant_ghgi,
+                'compliant_emissions': self._get_compliant_emissions(compliant_ghgi, gfa),
+                'compliance_status': self._get_compliance_statuses(baseline_ghgi, city_ghgi, standards),
+            }
+
+    def _prepare_input_data(self):
+        '''
+        Load and clean the input data, unless that has already been done for this model.
+        '''
+        if getattr(self, 'buildings', None) is None:
+            self._load_input_data()
+            self._clean_data()
+
+    def _get_baseline_panel(self, start_year, end_year):
+        '''
+        Returns the years as a column, the building IDs, and the (year x building) expected baseline and expected baseline GHGI
+        '''
+        self._prepare_input_data()
+
+        with self._profile_stage('expected_baselines') as stage:
+            years = np.arange(start_year, end_year + 1)[:, np.newaxis]
+            ids = self.building_data['OSEBuildingID'].to_numpy()
+            expected_baselines = self._get_expected_baseline_matrix(self.building_data, years.ravel()).T
+            baseline_ghgi = self._get_expected_baseline_ghgis(expected_baselines, self.buildings.gfas(ids))
+            stage['rows'] = expected_baselines.size
+        return years, ids, expected_baselines, baseline_ghgi
+
+    def _calculate_baseline_panel(self, start_year, end_year):
+        '''
+        Returns the calculated years and a dict of column name to (year x building) array
+        '''
+        self._prepare_input_data()
+
+        years, ids, expected_baselines, baseline_ghgi = self._get_baseline_panel(start_year, end_year)
+
+        # look up each use type's standard once and share it between the target and the compliance status
+        standards = self._get_use_type_standards(years, ids)
+
+        panel = {'expected_baseline': expected_baselines, 'expected_baseline_ghgi': baseline_ghgi}
+        panel.update(self._get_compliance_panel(ids, baseline_ghgi, standards))
+        panel['compliance_fees'] = self._get_noncompliance_fines(years, self.buildings.gfas(ids))
+
+        # keep the arrays behind scenario_results so later input changes can be recalculated in place
+        self._panel = dict(panel, years=years.ravel(), ids=ids, standards=standards)
+
+        return years.ravel(), panel
 
     def _calculate_baseline_model_without_saving(self, start_year, end_year):
-        self._load_input_data()
-        self._clean_data()
-        
-        baseline_building_info = pd.DataFrame(columns=['OSEBuildingID', 'BuildingName', 'Total GFA for Policy', 'sq_ft_classification'])
-        scen_calcs = self._fill_in_expected_baselines(start_year, end_year, self.building_data, baseline_building_info)
-        
-        scen_calcs['expected_baseline_ghgi'] = scen_calcs.apply(lambda building: self._get_expected_baseline_ghgi(building), axis=1)
-        scen_calcs['city_ghgi_target'] = scen_calcs.apply(lambda building: self._get_city_ghgi(building), axis=1)
-        scen_calcs['compliant_ghgi'] = scen_calcs.apply(lambda building: self._get_compliant_ghgi(building), axis=1)
-        scen_calcs['compliant_emissions'] = scen_calcs.apply(lambda building: self._get_compliant_emissions(building), axis=1)
-        scen_calcs['compliance_status'] = scen_calcs.apply(lambda building: self._get_compliance_status(building), axis=1)
-        scen_calcs['compliance_fees'] = scen_calcs.apply(lambda building: self._get_noncompliance_fines(building), axis=1)
-
-        return scen_calcs
+        years, panel = self._calculate_baseline_panel(start_year, end_year)
+        return self._make_panel_frame(self.building_data, years, panel)
     
-    def calculate_baseline_model(self, start_year, end_year):
+    def _calculate_model_without_saving(self, start_year, end_year):
+        '''
+        Calculate this model's scenario results. Subclasses with their own calculations override this,
+        so code that runs any kind of model (e.g. the parallel runner) can call it.
+        '''
+        return self._calculate_baseline_model_without_saving(start_year, end_year)
+
+    def _save_results(self, years, panel, lazy, run_length=False):
+        '''
+        Keep the calculated panel as model_name.results, and build model_name.scenario_results from it unless lazy.
+        With run_length, the columns that change rarely are kept as runs of years (see RunLengthResults) and the
+        full panel isn't kept for updating inputs
+        '''
+        if run_length:
+            self.results = RunLengthResults(self, years, panel)
+            self._panel = None
+        else:
+            self.results = ScenarioResults(self, years, panel)
+        self.scenario_results = None if lazy else self.results.to_frame()
+
+        if lazy:
+            print('Model calculations complete. Access the results as model_name.results, or the model dataframe with model_name.results.to_frame()')
+        else:
+            print('Model calculations complete. Access the model dataframe as model_name.scenario_results')
+
+    def calculate_baseline_model(self, start_year, end_year, lazy=False, run_length=False):
         '''
             start_year: year to begin calculations (inclusive)
             end_year: year to end calculations (inclusive)
+            lazy: if True, don't build the scenario_results dataframe; totals are summed from model_name.results instead
+            run_length: if True, keep the targets, compliant GHGI and emissions and compliance statuses in model_name.results
+                as runs of years over which they don't change, which uses less memory when they change rarely.
+                Use with lazy; the inputs can't be updated in place afterwards
+        '''
+        years, panel = self._calculate_baseline_panel(start_year, end_year)
+        self._save_results(years, panel, lazy, run_length)
+
+    # Updating inputs after the model has been calculated
+
+    # Inputs and derived values each derived scenario_results column is calculated from, in calculation order.
+    # 'standards' are the blended use type GHGI standards looked up in the timeline, which aren't saved in scenario_results.
+    DERIVED_COLUMN_DEPENDENCIES = {
+        'expected_baseline': ['energy_emissions'],
+        'expected_baseline_ghgi': ['expected_baseline'],
+        'standards': ['timeline'],
+        'city_ghgi_target': ['expected_baseline_ghgi', 'standards'],
+        'compliant_ghgi': ['expected_baseline_ghgi', 'city_ghgi_target'],
+        'compliant_emissions': ['compliant_ghgi'],
+        'compliance_status': ['expected_baseline_ghgi', 'city_ghgi_target', 'standards'],
+        'compliance_fees': ['fine_schedule'],
+    }
+
+    def _get_affected_columns(self, changed_input):
+        '''
+        Return every derived column that depends, directly or through other columns, on an input, in calculation order.
+        '''
+        affected = set([changed_input])
+        for column, dependencies in self.DERIVED_COLUMN_DEPENDENCIES.items():
+            if affected.intersection(dependencies):
+                affected.add(column)
+        return [column for column in self.DERIVED_COLUMN_DEPENDENCIES if column in affected]
+
+    def _recalculate(self, changed_input, year_mask=None, building_mask=None):
+        '''
+        Recalculate only the columns that depend on changed_input, and only for the affected years and buildings,
+        then copy the changed columns into scenario_results. Does nothing if calculate_baseline_model hasn't been run.
+
+        year_mask: boolean array over the calculated years, defaults to every year
+        building_mask: boolean array over the buildings, defaults to every building
+        '''
+        self._target_scale_panels = {}
+        panel = getattr(self, '_panel', None)
+        if panel is None:
+            return
+
+        years, ids = panel['years'], panel['ids']
+        year_rows = np.flatnonzero(year_mask) if year_mask is not None else np.arange(len(years))
+        building_cols = np.flatnonzero(building_mask) if building_mask is not None else np.arange(len(ids))
+        if len(year_rows) == 0 or len(building_cols) == 0:
+            return
+
+        block = np.ix_(year_rows, building_cols)
+        block_years = years[year_rows][:, np.newaxis]
+        block_ids = ids[building_cols]
+        gfa = self.buildings.gfas(block_ids)
+
+        columns = self._get_affected_columns(changed_input)
+        for column in columns:
+            if column == 'expected_baseline':
+                values = self._get_expected_baseline_matrix(self.building_data.iloc[building_cols], block_years.ravel()).T
+            elif column == 'expected_baseline_ghgi':
+                values = self._get_expected_baseline_ghgis(panel['expected_baseline'][block], gfa)
+            elif column == 'standards':
+                panel['standards'].update(year_rows, building_cols, self._get_use_type_standards(block_years, block_ids))
+                continue
+            elif column == 'city_ghgi_target':
+                values = self._get_city_ghgis(panel['expected_baseline_ghgi'][block], panel['standards'].select(year_rows, building_cols))
+            elif column == 'compliant_ghgi':
+                values = self._get_compliant_ghgis(panel['expected_baseline_ghgi'][block], panel['city_ghgi_target'][block])
+            elif column == 'compliant_emissions':
+                values = self._get_compliant_emissions(panel['compliant_ghgi'][block], gfa)
+            elif column == 'compliance_status':
+                values = self._get_compliance_statuses(panel['expected_baseline_ghgi'][block], panel['city_ghgi_target'][block], panel['standards'].select(year_rows, building_cols))
+            elif column == 'compliance_fees':
+                values = self._get_noncompliance_fines(block_years, gfa)
+            panel[column][block] = values
+
+        self.results.clear_cache()
+        if self.scenario_results is None:
+            return
+        for column in columns:
+            if column in self.scenario_results.columns:
+                self.scenario_results[column] = make_compliance_statuses(panel[column]) if column == 'compliance_status' else panel[column].ravel()
+
+    def _get_updatable_panel(self):
+        '''
+        Return the panel to update in place after an input changes. Results calculated without one (the alternative
+        compliance model, or a run_length run) can't be updated, so they are dropped rather than left out of date.
         '''
-        scen_calcs = self._calculate_baseline_model_without_saving(start_year, end_year)
-        self.scenario_results = scen_calcs
+        self._target_scale_panels = {}
+        panel = getattr(self, '_panel', None)
+        if panel is None and getattr(self, 'results', None) is not None:
+            self.results = None
+            self.scenario_results = None
+            print("These results can't be updated in place, so they have been dropped. Recalculate the model to get results for the new inputs")
+        return panel
+
+    def set_fine_schedule(self, fine_years=None, fine_per_sqft=None):
+        '''
+        Change the fine years and/or the per square foot fee. Only compliance_fees is recalculated,
+        and only for the years whose fines changed.
+        '''
+        old_fine_years, old_fine_per_sqft = self.fine_years, self.fine_per_sqft
+        if fine_years is not None:
+            self.fine_years = fine_years
+        if fine_per_sqft is not None:
+            self.fine_per_sqft = fine_per_sqft
+
+        panel = self._get_updatable_panel()
+        if panel is None:
+            return
+
+        was_fine_year = np.isin(panel['years'], old_fine_years)
+        is_fine_year = np.isin(panel['years'], self.fine_years)
+        year_mask = was_fine_year != is_fine_year
+        if self.fine_per_sqft != old_fine_per_sqft:
+            year_mask |= is_fine_year
 
-        print('Model calculations complete. Access the model dataframe as model_name.scenario_results')
+        self._recalculate('fine_schedule', year_mask)
+
+    def set_emission_factors(self, emission_factors):
+        '''
+        Change or add rows of the emissions factor table. Only the years whose factors changed are recalculated,
+        and the GHGI standards are reused.
+
+        emission_factors: dataframe indexed by Year with any of the emissions factor columns
+        '''
+        self._prepare_input_data()
+        old_factors = self.energy_emissions.copy()
+
+        energy_emissions = self.energy_emissions.reindex(self.energy_emissions.index.union(emission_factors.index))
+        energy_emissions.update(emission_factors)
+        self.energy_emissions = energy_emissions
+
+        changed_years = [year for year in emission_factors.index if year not in old_factors.index or not old_factors.loc[year].equals(energy_emissions.loc[year])]
+
+        panel = self._get_updatable_panel()
+        if panel is not None:
+            self._recalculate('energy_emissions', np.isin(panel['years'], changed_years))
+
+    def set_ghgi_targets(self, targets):
+        '''
+        Change or add GHGI targets in the timeline. Only the years, and the buildings with the sq ft classifications
+        and use types, that the changed targets apply to are recalculated.
+
+        targets: dataframe with year, building_type, sq_ft_classification and ghgi columns
+        '''
+        self._prepare_input_data()
+        keys = ['year', 'building_type', 'sq_ft_classification']
+        targets = targets[keys + ['ghgi']]
+
+        # changed targets replace the timeline's row for the same year, building type and size
+        timeline = self.timeline.astype({'year': int, 'building_type': object, 'sq_ft_classification': object})
+        self.timeline = pd.concat([targets, timeline], ignore_index=True).drop_duplicates(keys)
+        self._apply_dtype_schema()
+        self.ghgi_targets = GHGITargetIndex(self.timeline)
+
+        panel = self._get_updatable_panel()
+        if panel is None:
+            return
+
+        ids = panel['ids']
+        sq_ft_classes = self.buildings.sq_ft_classes(ids)
+        building_mask = np.zeros(len(ids), dtype=bool)
+        for building_type, sq_ft_class in targets[['building_type', 'sq_ft_classification']].drop_duplicates().itertuples(index=False):
+            building_mask |= (sq_ft_classes == sq_ft_class) & self.buildings.lists_use_types(ids, [building_type])
+
+        self._recalculate('timeline', np.isin(panel['years'], targets['year'].to_numpy()), building_mask)
+
+    # Solving for target reductions
+
+    def _get_target_scale_panel(self, year):
+        '''
+        Return the building IDs, expected baseline GHGI and use type standards for a single year.
+        These don't depend on the target scale, so they are calculated once per year and reused.
+        '''
+        if year not in self._target_scale_panels:
+            years, ids, _, baseline_ghgi = self._get_baseline_panel(year, year)
+            self._target_scale_panels[year] = (ids, baseline_ghgi, self._get_use_type_standards(years, ids))
+        return self._target_scale_panels[year]
+
+    def get_total_emissions_at_target_scale(self, scale, year):
+        '''
+        Return total compliant emissions in a year if every GHGI target in the timeline is multiplied by scale.
+        E.g. a scale of 0.8 gives the emissions if every target were 20% lower.
+        '''
+        self._prepare_input_data()
+        ids, baseline_ghgi, standards = self._get_target_scale_panel(year)
+        panel = self._get_compliance_panel(ids, baseline_ghgi, standards.scale(scale))
+        return panel['compliant_emissions'].sum()
+
+    def find_target_scale(self, target_kg, target_year, tolerance_kg=5000, max_iterations=100, low=0.0, high=1.0):
+        '''
+        Find the multiplier for the timeline's GHGI targets that brings total compliant emissions in target_year to target_kg.
+
+        Total emissions only go up as the targets go up, and are linear in between the scales where a building's
+        target crosses its baseline, so the search interpolates between the ends of the bracket (the Illinois
+        variant of regula falsi) instead of halving it. This usually lands on the exact scale in a few steps.
+
+        target_kg: total emissions to hit in target_year
+        tolerance_kg: stop once the emissions are this close to target_kg
+        max_iterations: stop after this many steps, returning the closest scale found
+        low, high: range of scales to search
+        '''
+        low_emissions = self.get_total_emissions_at_target_scale(low, target_year) - target_kg
+        high_emissions = self.get_total_emissions_at_target_scale(high, target_year) - target_kg
+
+        if low_emissions > tolerance_kg or high_emissions < -tolerance_kg:
+            raise ValueError(f'{target_kg} kg in {target_year} is not reachable with target scales between {low} and {high}')
+        if abs(low_emissions) <= tolerance_kg:
+            return low
+        if abs(high_emissions) <= tolerance_kg:
+            return high
+
+        last_side = None
+        closest_scale, closest_emissions = (low, low_emissions) if -low_emissions < high_emissions else (high, high_emissions)
+        for _ in range(max_iterations):
+            scale = low - low_emissions * (high - low) / (high_emissions - low_emissions)
+            if not low < scale < high:
+                scale = (low + high) / 2
+            emissions = self.get_total_emissions_at_target_scale(scale, target_year) - target_kg
+
+            if abs(emissions) <= tolerance_kg:
+                return scale
+            if abs(emissions) < abs(closest_emissions):
+                closest_scale, closest_emissions = scale, emissions
+
+            # halve the weight of the end that stays put twice in a row, so the bracket keeps shrinking from both sides
+            if emissions < 0:
+                low, low_emissions = scale, emissions
+                if last_side == 'low':
+                    high_emissions /= 2
+                last_side = 'low'
+            else:
+                high, high_emissions = scale, emissions
+                if last_side == 'high':
+                    low_emissions /= 2
+                last_side = 'high'
+
+        print(f'Target scale search stopped after {max_iterations} iterations without getting within {tolerance_kg} kg of the target')
+        return closest_scale
 
     # Calculating statistics about the model
+
+    def get_scenario_results_with_building_info(self):
+        '''
+        Return scenario_results with each building's name, GFA, sq ft classification and use types on every row, e.g. for saving to CSV
+        '''
+        scenario_results = self.scenario_results if self.scenario_results is not None else self.results.to_frame()
+
+        building_info = self.building_data.drop_duplicates('OSEBuildingID')[self.BUILDING_INFO_COLUMNS]
+        positions = self.buildings.positions(scenario_results['OSEBuildingID'])
+        building_info = building_info.iloc[positions].set_axis(scenario_results.index)
+
+        return pd.concat([building_info, scenario_results.drop(columns='OSEBuildingID')], axis=1)
     
+    def write_partitioned_results(self, output_dir, scenario='baseline'):
+        '''
+        Write the calculated results to output_dir in a compressed columnar format, one file per year, as the given scenario.
+        See result_writers.PartitionedResultWriter, which can also write many scenarios to the same directory as they finish.
+        '''
+        PartitionedResultWriter(output_dir).write(scenario, self)
+
+    def write_summary_csv(self, path, scenario='baseline'):
+        '''
+        Write the calculated totals by year to a compact CSV file. See result_writers.SummaryCSVWriter for many scenarios.
+        '''
+        SummaryCSVWriter(path).write(scenario, self)
+
+    def get_compliance_events(self):
+        '''
+        Return the calculated results' compliance events, to find fines under any fine schedule without recalculating, see ComplianceEvents
+        '''
+        return ComplianceEvents(self)
+
     def get_total_emissions_by_year(self):
-        if self.scenario_results is None:
+        if getattr(self, 'results', None) is None and getattr(self, 'scenario_results', None) is None:
             print('You need to run the calculate_baseline_model method before getting the emissions by year')
             return
-        
-        grouped = self.scenario_results[self.scenario_results['sq_ft_classification'] != 'F'].groupby('year')['compliant_emissions'].sum()
-        grouped = grouped.to_frame()
+
+        if getattr(self, 'results', None) is not None:
+            grouped = self.results.get_total_by_year('compliant_emissions').to_frame()
+        else:
+            is_covered = self.buildings.sq_ft_classes(self.scenario_results['OSEBuildingID']) != 'F'
+            grouped = self.scenario_results[is_covered].groupby('year')['compliant_emissions'].sum()
+            grouped = grouped.to_frame()
 
         self.emissions_by_year = grouped
         print('Emissions by year calculations complete. Access the annual emissions dataframe as model_name.emissions_by_year')
 
     def get_percent_emissions_reduction_by_given_year(self, year):
+        if getattr(self, 'results', None) is not None:
+            return self.results.get_percent_emissions_reduction_by_given_year(year)
+
         # 2026 emissions are the same as the 2027 baseline
         baseline_2026 = self.scenario_results[self.scenario_results['year'] == 2027]['expected_baseline'].sum()
 
         emissions_in_target_year = self.scenario_results[self.scenario_results['year'] == year]['compliant_emissions'].sum()
 
-        return 1 - (emissions_in_target_year / baseline_2026)
\ No newline at end of file
+        return 1 - (emissions_in_target_year / baseline_2026)
@@ -0,0 +1,144 @@
+import pandas as pd
+import numpy as np
+
+from use_type_weights import UseTypeWeights
+
+class BuildingStore:
+    USE_TYPE_COLUMNS = ['LargestPropertyUseType OSE', 'SecondLargestPropertyUseType OSE', 'ThirdLargestPropertyUseType OSE']
+    PERCENT_GFA_COLUMNS = ['LargestPropertyUseType Percent GFA', 'SecondLargestPropertyUseType Percent GFA', 'ThirdLargestPropertyUseType Percent GFA']
+    BUILDING_TYPE_COLUMN = 'OSE Building Type'
+    # columns of a long format use type table, one row per building and use type
+    USE_TYPE_SHARE_COLUMNS = ['OSEBuildingID', 'PropertyUseType OSE', 'PropertyUseType Percent GFA']
+
+    def __init__(self, building_data, use_type_shares=None):
+        '''
+        Per-building attributes held as compact arrays and indexed by OSEBuildingID,
+        so attributes can be gathered for many buildings at once without scanning the building data.
+
+        building_data: cleaned building data, one row per building
+        use_type_shares: optional long format table with USE_TYPE_SHARE_COLUMNS, for buildings with any number of use types.
+            Buildings it lists take their use types and shares of GFA from it instead of the three use type columns.
+            Rows for buildings that aren't in the building data are ignored
+        '''
+        # the first row wins if a building is listed more than once
+        buildings = building_data.drop_duplicates('OSEBuildingID')
+
+        self.ids = buildings['OSEBuildingID'].to_numpy(dtype=np.int64)
+        self._id_order = np.argsort(self.ids, kind='stable')
+        self._sorted_ids = self.ids[self._id_order]
+
+        # use types are stored as codes into one shared list of categories, -1 for NaN
+        use_types = buildings[self.USE_TYPE_COLUMNS].astype(object)
+        listed_use_types = [] if use_type_shares is None else [use_type_shares[self.USE_TYPE_SHARE_COLUMNS[1]].astype(object).dropna()]
+        self.use_type_categories = pd.Index(sorted(pd.unique(pd.concat([use_types.stack().dropna()] + listed_use_types))), dtype=object)
+        self.use_type_codes = np.stack([self.use_type_categories.get_indexer(use_types[col]) for col in self.USE_TYPE_COLUMNS], axis=1).astype(np.int16)
+
+        self.percent_gfa = buildings[self.PERCENT_GFA_COLUMNS].to_numpy(dtype=float)
+        self.gfa = buildings['Total GFA for Policy'].to_numpy(dtype=float)
+
+        sq_ft_classes = pd.Categorical(buildings['sq_ft_classification'].astype(object))
+        self.sq_ft_class_categories = pd.Index(sq_ft_classes.categories, dtype=object)
+        self.sq_ft_class_codes = sq_ft_classes.codes
+
+        building_types = pd.Categorical(buildings[self.BUILDING_TYPE_COLUMN].astype(object))
+        self.building_type_categories = pd.Index(building_types.categories, dtype=object)
+        self.building_type_codes = building_types.codes
+
+        # sparse building x (sq ft classification, use type) GFA shares, for blending GHGI standards
+        self.use_type_weights = self._make_use_type_weights(use_type_shares)
+
+    def _make_use_type_weights(self, use_type_shares):
+        '''
+        Return the UseTypeWeights of the three use type columns, with the buildings listed in use_type_shares
+        taking their use types from there instead
+        '''
+        num_columns = len(self.USE_TYPE_COLUMNS)
+        rows = np.repeat(np.arange(len(self.ids)), num_columns)
+        use_type_codes = self.use_type_codes.ravel()
+        shares = self.percent_gfa.ravel()
+
+        if use_type_shares is not None:
+            id_col, use_type_col, share_col = self.USE_TYPE_SHARE_COLUMNS
+            listed_ids = use_type_shares[id_col].to_numpy(dtype=np.int64)
+            is_known = np.isin(listed_ids, self.ids)
+            listed_rows = self.positions(listed_ids[is_known])
+            listed_codes = self.use_type_categories.get_indexer(use_type_shares[use_type_col].astype(object)[is_known])
+            listed_shares = use_type_shares[share_col].to_numpy(dtype=float)[is_known]
+
+            is_unlisted = ~np.isin(rows, listed_rows)
+            rows = np.concatenate([rows[is_unlisted], listed_rows])
+            use_type_codes = np.concatenate([use_type_codes[is_unlisted], listed_codes])
+            shares = np.concatenate([shares[is_unlisted], listed_shares])
+
+        return UseTypeWeights(rows, use_type_codes, shares, self.sq_ft_class_codes, self.use_type_categories, self.sq_ft_class_categories)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def positions(self, ids):
+        '''
+        Return the position of each OSEBuildingID in the store. Raises a KeyError for unknown IDs.
+        '''
+        ids = np.asarray(ids, dtype=np.int64)
+        sorted_positions = np.searchsorted(self._sorted_ids, ids).clip(max=len(self._sorted_ids) - 1)
+        if not np.all(self._sorted_ids[sorted_positions] == ids):
+            missing = np.unique(ids[self._sorted_ids[sorted_positions] != ids])
+            raise KeyError(f'Buildings not in the building data: {missing[:10].tolist()}')
+        return self._id_order[sorted_positions]
+
+    def gather(self, values, ids):
+        '''
+        Gather rows of one of the store's arrays for the given OSEBuildingIDs.
+        '''
+        return values[self.positions(ids)]
+
+    def use_types(self, ids):
+        '''
+        Return the three largest use types in the building data for each building as an object array, NaN where a building
+        has no use type. See use_type_weights for every use type of buildings listed in use_type_shares.
+        '''
+        codes = self.gather(self.use_type_codes, ids)
+        return np.where(codes >= 0, self.use_type_categories.to_numpy()[codes], np.nan)
+
+    def percent_gfas(self, ids):
+        '''
+        Return each building's share of GFA for the three largest use types in the building data.
+        '''
+        return self.gather(self.percent_gfa, ids)
+
+    def sq_ft_classes(self, ids):
+        '''
+        Return the sq ft classification (A-F) for each building.
+        '''
+        codes = self.gather(self.sq_ft_class_codes, ids)
+        return np.where(codes >= 0, self.sq_ft_class_categories.to_numpy()[codes], np.nan)
+
+    def building_types(self, ids):
+        '''
+        Return the OSE building type (Multifamily, NonResidential or Campus) for each building.
+        '''
+        codes = self.gather(self.building_type_codes, ids)
+        return np.where(codes >= 0, self.building_type_categories.to_numpy()[codes], np.nan)
+
+    def _get_use_type_codes(self, use_types):
+        '''
+        Return the codes of the given use types, -1 for NaN, leaving out use types no building has
+        '''
+        codes = self.use_type_categories.get_indexer(pd.Index(use_types, dtype=object))
+        return codes[(codes >= 0) | pd.isna(use_types)]
+
+    def get_use_type_shares(self, ids, use_types):
+        '''
+        Return each building's total share of GFA in any of the given use types (NaN for use types that aren't given),
+        counting every use type it lists
+        '''
+        return self.use_type_weights.get_use_type_shares(self._get_use_type_codes(use_types), self.positions(ids))
+
+    def lists_use_types(self, ids, use_types):
+        '''
+        Return whether each building lists any of the given use types
+        '''
+        return self.use_type_weights.lists_use_types(self._get_use_type_codes(use_types), self.positions(ids))
+
+    def gfas(self, ids):
+        return self.gather(self.gfa, ids)
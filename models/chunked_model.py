@@ -0,0 +1,130 @@
+import os
+
+import pandas as pd
+import numpy as np
+
+from baseline_model import BaselineBEPSModel
+from building_store import BuildingStore
+from schema import COMPLIANCE_STATUS_DTYPE, apply_building_schema, make_dimension_dtypes
+
+class ChunkedBEPSModel(BaselineBEPSModel):
+    # scenario_results columns summed into the running aggregates
+    AGGREGATE_COLUMNS = ['expected_baseline', 'compliant_emissions', 'compliance_fees']
+
+    def __init__(self, emissions_path, timeline_path, building_data_path, fine_years, fine_per_sqft, chunk_size=50000, spill_path=None, cache_dir=None, use_type_shares_path=None):
+        '''
+        The baseline model for building inventories too large to hold as one building x year panel.
+        Buildings are read chunk_size rows at a time; each chunk's year panel is calculated, folded into running
+        totals by year, by OSE building type and by sq ft classification, and then dropped, so memory depends on
+        the chunk size rather than the size of the inventory.
+
+        emissions_path, timeline_path, building_data_path, fine_years, fine_per_sqft, cache_dir, use_type_shares_path: as in BaselineBEPSModel
+        chunk_size: number of rows of building data to read and calculate at a time
+        spill_path: optional CSV file to append each chunk's rows of scenario_results to, for the full panel
+        '''
+        BaselineBEPSModel.__init__(self, emissions_path, timeline_path, building_data_path, fine_years, fine_per_sqft, cache_dir, use_type_shares_path=use_type_shares_path)
+        self.chunk_size = chunk_size
+        self.spill_path = spill_path
+
+    def _iter_building_chunks(self):
+        '''
+        Read and clean the building data one chunk at a time, pointing the model at each cleaned chunk in turn.
+        '''
+        for chunk in pd.read_csv(self.building_data_path, chunksize=self.chunk_size):
+            self.building_data = apply_building_schema(chunk, make_dimension_dtypes(chunk, self.timeline))
+            self._filter_out_small_buildings()
+            self._filter_out_buildings_without_energy_use()
+            if len(self.building_data) == 0:
+                continue
+
+            self.buildings = BuildingStore(self.building_data, self.use_type_shares)
+            yield self.building_data
+
+    def _sum_by_group(self, years, panel, labels):
+        '''
+        Sum the aggregate columns of a (year x building) panel for each year and each group of buildings.
+        Returns a dataframe indexed by year and group label, with a count of buildings in each group.
+        '''
+        codes, groups = pd.factorize(labels, use_na_sentinel=False)
+
+        sums = {}
+        for col in self.AGGREGATE_COLUMNS:
+            totals = np.zeros((len(years), len(groups)))
+            np.add.at(totals, (slice(None), codes), panel[col])
+            sums[col] = totals.ravel()
+        sums['buildings'] = np.tile(np.bincount(codes, minlength=len(groups)), len(years))
+
+        index = pd.MultiIndex.from_arrays([np.repeat(years, len(groups)), np.tile(np.asarray(groups, dtype=object), len(years))])
+        return pd.DataFrame(sums, index=index)
+
+    def _fold_chunk(self, years, ids, panel):
+        '''
+        Add a chunk's panel to the running aggregates.
+        '''
+        by_year = pd.DataFrame({col: panel[col].sum(axis=1) for col in self.AGGREGATE_COLUMNS}, index=years)
+        statuses = np.stack([(panel['compliance_status'] == code).sum(axis=1) for code in range(len(COMPLIANCE_STATUS_DTYPE.categories))], axis=1)
+        by_year[list(COMPLIANCE_STATUS_DTYPE.categories)] = statuses
+
+        chunk_aggregates = {
+            'year': by_year,
+            'building_type': self._sum_by_group(years, panel, self.buildings.building_types(ids)),
+            'sq_ft_classification': self._sum_by_group(years, panel, self.buildings.sq_ft_classes(ids)),
+        }
+        for key, aggregates in chunk_aggregates.items():
+            running = self._running_aggregates.get(key)
+            self._running_aggregates[key] = aggregates if running is None else running.add(aggregates, fill_value=0)
+
+    def _spill_chunk(self, scenario_results):
+        scenario_results.to_csv(self.spill_path, mode='a', header=not os.path.exists(self.spill_path))
+
+    def calculate_baseline_model(self, start_year, end_year):
+        '''
+            start_year: year to begin calculations (inclusive)
+            end_year: year to end calculations (inclusive)
+        '''
+        self._load_timeline_data()
+        self._load_use_type_shares()
+        self._load_emissions_data()
+        if self.spill_path is not None and os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+
+        self._running_aggregates = {}
+        for building_data in self._iter_building_chunks():
+            years, ids, expected_baselines, baseline_ghgi = self._get_baseline_panel(start_year, end_year)
+            standards = self._get_use_type_standards(years, ids)
+
+            panel = {'expected_baseline': expected_baselines, 'expected_baseline_ghgi': baseline_ghgi}
+            panel.update(self._get_compliance_panel(ids, baseline_ghgi, standards))
+            panel['compliance_fees'] = self._get_noncompliance_fines(years, self.buildings.gfas(ids))
+
+            self._fold_chunk(years.ravel(), ids, panel)
+            if self.spill_path is not None:
+                self._spill_chunk(self._make_panel_frame(building_data, years.ravel(), panel))
+
+        aggregates = self._running_aggregates
+        self.aggregates_by_year = aggregates['year'].rename_axis('year')
+        self.aggregates_by_building_type = aggregates['building_type'].sort_index().rename_axis(['year', 'building_type'])
+        self.aggregates_by_sq_ft_class = aggregates['sq_ft_classification'].sort_index().rename_axis(['year', 'sq_ft_classification'])
+        self.scenario_results = None
+
+        print('Model calculations complete. Access the totals as model_name.aggregates_by_year, model_name.aggregates_by_building_type and model_name.aggregates_by_sq_ft_class')
+        if self.spill_path is not None:
+            print(f'The full model dataframe was written to {self.spill_path}')
+
+    # Calculating statistics about the model
+
+    def get_total_emissions_by_year(self):
+        if getattr(self, 'aggregates_by_year', None) is None:
+            print('You need to run the calculate_baseline_model method before getting the emissions by year')
+            return
+
+        # small ('F') buildings are filtered out of every chunk, so every building is covered
+        self.emissions_by_year = self.aggregates_by_year[['compliant_emissions']]
+        print('Emissions by year calculations complete. Access the annual emissions dataframe as model_name.emissions_by_year')
+
+    def get_percent_emissions_reduction_by_given_year(self, year):
+        # 2026 emissions are the same as the 2027 baseline
+        baseline_2026 = self.aggregates_by_year.loc[2027, 'expected_baseline']
+        emissions_in_target_year = self.aggregates_by_year.loc[year, 'compliant_emissions']
+
+        return 1 - (emissions_in_target_year / baseline_2026)
@@ -0,0 +1,123 @@
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import sys
+import time
+
+from baseline_model import BaselineBEPSModel
+from parallel_runner import apply_scenario
+from result_writers import PartitionedResultWriter, SummaryCSVWriter
+
+# Run scenarios without a notebook, e.g. from cron:
+#   python models/cli.py data/scenarios/jan_and_june.json --output-dir data/output_data
+#
+# Each scenario file is JSON with one scenario or a list of them. A scenario has a name and any of timeline_path,
+# emissions_path, fine_years and fine_per_sqft; anything left out uses the command line defaults.
+# Paths in a scenario file are relative to the file. The building data is loaded and cleaned once for every scenario.
+# Every scenario's totals by year are appended to summary.csv in the output directory as it finishes, and its results
+# for every building are written to results/, partitioned by scenario and year (see result_writers.read_partitioned_results).
+
+MODELS = ['baseline', 'alternative']
+
+def load_scenarios(spec_paths):
+    '''
+    Return every scenario in the given scenario files, in order, with paths made relative to the working directory.
+    '''
+    scenarios = []
+    for spec_path in spec_paths:
+        with open(spec_path) as f:
+            spec = json.load(f)
+
+        spec_dir = os.path.dirname(os.path.abspath(spec_path))
+        for scenario in spec if isinstance(spec, list) else [spec]:
+            scenario = dict(scenario)
+            for key in ('timeline_path', 'emissions_path'):
+                if key in scenario:
+                    scenario[key] = os.path.join(spec_dir, scenario[key])
+            scenarios.append(scenario)
+
+    names = [scenario['name'] for scenario in scenarios]
+    duplicates = sorted(set(name for name in names if names.count(name) > 1))
+    if duplicates:
+        raise ValueError(f'Scenario names must be unique, found more than one of: {", ".join(duplicates)}')
+    return scenarios
+
+def make_template_model(args, scenarios):
+    if args.model == 'alternative':
+        # only imported when it's used, so baseline runs don't pay for it
+        from alternative_compliance_model import AlternativeComplianceModel
+        model_class = AlternativeComplianceModel
+    else:
+        model_class = BaselineBEPSModel
+
+    # the template needs a timeline to load; scenarios with their own timeline replace it
+    timeline = args.timeline or next((scenario['timeline_path'] for scenario in scenarios if 'timeline_path' in scenario), None)
+    model = model_class(args.emissions, timeline, args.building_data, args.fine_years, args.fine_per_sqft, cache_dir=args.cache_dir, baseline_years=args.baseline_years, baseline_window=args.baseline_window, use_type_shares_path=args.use_type_shares)
+    model._prepare_input_data()
+    return model
+
+def run_scenario(template_model, scenario, args):
+    '''
+    Run one scenario on a copy of the template model, which shares its loaded input data
+    '''
+    model = copy.copy(template_model)
+    apply_scenario(model, scenario)
+
+    # the writers read the model's arrays, so the per-row dataframe is never built.
+    # The models print a message after each step, which is noise here
+    with contextlib.redirect_stdout(io.StringIO()):
+        if args.model == 'alternative':
+            model.calculate_alternative_compliance_model(args.start_year, args.end_year, lazy=True, run_length=args.run_length)
+        else:
+            model.calculate_baseline_model(args.start_year, args.end_year, lazy=True, run_length=args.run_length)
+    return model
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run BEPS model scenarios and write their results.')
+    parser.add_argument('scenario_files', nargs='+', help='JSON files with one scenario or a list of scenarios')
+    parser.add_argument('--emissions', default='data/input_data/energy_emissions.csv', help='table of energy emissions factors for each year')
+    parser.add_argument('--building-data', default='data/input_data/Data cleaning/cleaned_building_data_with_policy_gfa.csv', help='cleaned building data')
+    parser.add_argument('--timeline', help='default timeline of GHGI targets, for scenarios without a timeline_path')
+    parser.add_argument('--fine-years', type=int, nargs='*', default=[2030, 2035, 2040, 2045, 2050], help='default years building owners can be fined in')
+    parser.add_argument('--fine-per-sqft', type=float, default=2.5, help='default per square foot fee for non-compliance')
+    parser.add_argument('--start-year', type=int, default=2027)
+    parser.add_argument('--end-year', type=int, default=2050)
+    parser.add_argument('--model', choices=MODELS, default='baseline', help='which model to run every scenario with')
+    parser.add_argument('--output-dir', default='.', help='directory to write summary.csv and the results folder to')
+    parser.add_argument('--no-building-results', dest='building_results', action='store_false', help='only write the totals by year')
+    parser.add_argument('--run-length', action='store_true', help='hold each scenario\'s targets and compliant emissions as runs of years, which uses less memory for long horizons')
+    parser.add_argument('--baseline-years', type=int, nargs=2, metavar=('FIRST', 'LAST'), help='average energy use over these years of building data with several DataYears per building')
+    parser.add_argument('--baseline-window', type=int, help='average energy use over each building\'s most recently reported years')
+    parser.add_argument('--use-type-shares', help='long format table of building use types and shares of GFA, for buildings with more than three use types')
+    parser.add_argument('--cache-dir', help='directory to cache the loaded and cleaned input tables in between runs')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = load_scenarios(args.scenario_files)
+
+    start = time.perf_counter()
+    template_model = make_template_model(args, scenarios)
+    print(f'Loaded the input data in {time.perf_counter() - start:.2f}s')
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    summary_writer = SummaryCSVWriter(os.path.join(args.output_dir, 'summary.csv'))
+    result_writer = PartitionedResultWriter(os.path.join(args.output_dir, 'results')) if args.building_results else None
+
+    for scenario in scenarios:
+        if 'timeline_path' not in scenario and args.timeline is None:
+            print(f'Skipping {scenario["name"]}: it has no timeline_path and there is no --timeline default', file=sys.stderr)
+            continue
+
+        start = time.perf_counter()
+        model = run_scenario(template_model, scenario, args)
+        summary_writer.write(scenario['name'], model)
+        if result_writer is not None:
+            result_writer.write(scenario['name'], model)
+        print(f'{scenario["name"]}: done in {time.perf_counter() - start:.2f}s')
+
+if __name__ == '__main__':
+    main()
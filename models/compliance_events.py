@@ -0,0 +1,120 @@
+import pandas as pd
+import numpy as np
+
+from run_length_results import RunLengthColumn
+from schema import COMPLIANCE_STATUS_DTYPE, ID_DTYPE, YEAR_DTYPE
+
+# compliance status codes, see schema.COMPLIANCE_STATUS_DTYPE
+NOT_DUE = COMPLIANCE_STATUS_DTYPE.categories.get_loc('Not due yet')
+NON_COMPLIANT = COMPLIANCE_STATUS_DTYPE.categories.get_loc('No')
+
+class ComplianceEvents:
+    def __init__(self, model):
+        '''
+        Each building's compliance history as events instead of a row per year: the intervals of years it is
+        non-compliant, its first due year and its first non-compliant year. Fines for any fine schedule are found
+        by searching the schedule's sorted fine years for the edges of the non-compliant intervals, so a fine is only
+        charged in a fine year where the building isn't compliant (unlike the compliance_fees column, which charges
+        every covered building in every fine year).
+
+        model: a calculated BaselineBEPSModel (or subclass), run lazily or not
+        '''
+        results = model.results
+        statuses = results.runs['compliance_status'] if 'compliance_status' in getattr(results, 'runs', {}) else RunLengthColumn(results.panel['compliance_status'])
+        buildings, starts, ends, values = statuses.get_runs()
+
+        self.years = np.asarray(results.years)
+        self.ids = results.ids
+        self.gfa = model.buildings.gfas(self.ids)
+
+        # the first year of each building's first run with a given status
+        def first_year(is_status):
+            first_years = np.full(len(self.ids), -1, dtype=np.int64)
+            runs = np.flatnonzero(is_status)[::-1]
+            first_years[buildings[runs]] = self.years[starts[runs]]
+            return first_years
+
+        self.first_due_years = first_year(values != NOT_DUE)
+        self.first_non_compliant_years = first_year(values == NON_COMPLIANT)
+
+        # non-compliant intervals [start year, end year), as years
+        is_non_compliant = values == NON_COMPLIANT
+        self.interval_buildings = buildings[is_non_compliant]
+        self.interval_starts = self.years[starts[is_non_compliant]]
+        self.interval_ends = self.years[0] + ends[is_non_compliant]
+
+        # GFA of the non-compliant buildings in each year, which is all any schedule's total fines depend on
+        deltas = np.bincount(starts[is_non_compliant], weights=self.gfa[self.interval_buildings], minlength=len(self.years) + 1)
+        deltas -= np.bincount(ends[is_non_compliant], weights=self.gfa[self.interval_buildings], minlength=len(self.years) + 1)
+        self.non_compliant_gfa = np.cumsum(deltas)[:-1]
+
+    def _sorted_fine_years(self, fine_years):
+        return np.unique(np.asarray(fine_years, dtype=np.int64))
+
+    def get_building_events(self):
+        '''
+        Return each building's first due year and first non-compliant year, <NA> if it never is within the calculated years.
+        '''
+        return pd.DataFrame({
+            'first_due_year': pd.Series(self.first_due_years).where(self.first_due_years >= 0).astype('Int16').array,
+            'first_non_compliant_year': pd.Series(self.first_non_compliant_years).where(self.first_non_compliant_years >= 0).astype('Int16').array,
+        }, index=pd.Index(self.ids.astype(ID_DTYPE), name='OSEBuildingID'))
+
+    def get_fine_events(self, fine_years, fine_per_sqft):
+        '''
+        Return one row per fine charged: the building, the fine year, the first year of the compliance interval
+        the fine year ends (the year after the previous fine year) and the fine.
+        '''
+        fine_years = self._sorted_fine_years(fine_years)
+
+        # fine years from first to last - 1 fall in each building's non-compliant interval
+        first = np.searchsorted(fine_years, self.interval_starts, side='left')
+        last = np.searchsorted(fine_years, self.interval_ends, side='left')
+        counts = last - first
+        interval_runs = np.repeat(np.arange(len(counts)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        event_fine_years = first[interval_runs] + offsets
+
+        buildings = self.interval_buildings[interval_runs]
+        previous_fine_years = np.concatenate([[self.years[0] - 1], fine_years])[event_fine_years]
+        events = pd.DataFrame({
+            'OSEBuildingID': self.ids[buildings].astype(ID_DTYPE),
+            'year': fine_years[event_fine_years].astype(YEAR_DTYPE),
+            'interval_start': np.maximum(previous_fine_years + 1, self.years[0]).astype(YEAR_DTYPE),
+            'fine': self.gfa[buildings] * fine_per_sqft,
+        })
+        return events.sort_values(['year', 'OSEBuildingID'], kind='stable', ignore_index=True)
+
+    def get_fines_by_year(self, fine_years, fine_per_sqft):
+        '''
+        Return the fines charged in each calculated year and their cumulative total, as a dataframe indexed by year.
+        '''
+        fine_years = self._sorted_fine_years(fine_years)
+        is_fine_year = np.isin(self.years, fine_years)
+        fines = np.where(is_fine_year, self.non_compliant_gfa * fine_per_sqft, 0)
+        return pd.DataFrame({'fines': fines, 'cumulative_fines': np.cumsum(fines)}, index=pd.Index(self.years.astype(YEAR_DTYPE), name='year'))
+
+    def get_total_fines(self, schedules, start_year=None, end_year=None):
+        '''
+        Return the total fines collected between start_year and end_year (inclusive, default every calculated year)
+        under each fine schedule. Every schedule is evaluated at once, as a (schedule x year) matrix times the GFA
+        of the non-compliant buildings in each year, so thousands of schedules take about as long as one.
+
+        schedules: dict of schedule name to (fine_years, fine_per_sqft)
+        '''
+        start_year = self.years[0] if start_year is None else start_year
+        end_year = self.years[-1] if end_year is None else end_year
+        in_range = (self.years >= start_year) & (self.years <= end_year)
+
+        names = list(schedules)
+        fines_per_sqft = np.array([schedules[name][1] for name in names], dtype=float)
+        fine_years = [np.asarray(schedules[name][0], dtype=np.int64) for name in names]
+        schedule_rows = np.repeat(np.arange(len(names)), [len(years) for years in fine_years])
+        year_rows = np.concatenate(fine_years) - self.years[0] if names else np.array([], dtype=np.int64)
+        is_calculated = (year_rows >= 0) & (year_rows < len(self.years))
+
+        is_fine_year = np.zeros((len(names), len(self.years)))
+        is_fine_year[schedule_rows[is_calculated], year_rows[is_calculated]] = 1
+
+        totals = (is_fine_year[:, in_range] @ self.non_compliant_gfa[in_range]) * fines_per_sqft
+        return pd.Series(totals, index=pd.Index(names, name='schedule'), name='total_fines')
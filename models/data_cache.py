@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import pandas as pd
+import numpy as np
+
+class DataCache:
+    # bump when the layout on disk or the cleaning steps whose output is cached change
+    CACHE_VERSION = 1
+
+    def __init__(self, cache_dir):
+        '''
+        Cache of input tables in a typed binary columnar format: one .npy file per column plus a JSON manifest.
+        String columns are stored as categorical codes and numeric columns keep their dtype.
+        Tables are keyed by the hash of the source file they came from, so an edited source file is a cache miss,
+        and are loaded back with memory mapping.
+
+        cache_dir: directory to keep the cached tables in
+        '''
+        self.cache_dir = cache_dir
+
+    def _hash_file(self, path):
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        return sha.hexdigest()
+
+    def _entry_dir(self, name, source_path):
+        key = f'{self.CACHE_VERSION}-{self._hash_file(source_path)}'
+        return os.path.join(self.cache_dir, f'{name}-{key[:24]}')
+
+    def load(self, name, source_path):
+        '''
+        Return the cached table for a source file, or None if it isn't cached.
+        '''
+        entry_dir = self._entry_dir(name, source_path)
+        manifest_path = os.path.join(entry_dir, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            return None
+
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+        columns = {}
+        for i, column in enumerate(manifest['columns']):
+            values = np.load(os.path.join(entry_dir, f'{i}.npy'), mmap_mode='r')
+            if column['kind'] == 'category':
+                values = pd.Categorical.from_codes(values, categories=column['categories'])
+            columns[column['name']] = values
+
+        index = np.load(os.path.join(entry_dir, 'index.npy'), mmap_mode='r')
+        table = pd.DataFrame(columns, index=pd.Index(index, name=manifest['index_name']), copy=False)
+        return table
+
+    def save(self, name, source_path, table):
+        '''
+        Cache a table for a source file, replacing any tables cached from older versions of the same file.
+        '''
+        entry_dir = self._entry_dir(name, source_path)
+        tmp_dir = f'{entry_dir}.tmp-{uuid.uuid4().hex}'
+        os.makedirs(tmp_dir)
+
+        manifest = {'source_path': os.path.abspath(source_path), 'index_name': table.index.name, 'columns': []}
+        for i, col in enumerate(table.columns):
+            values = table[col]
+            if pd.api.types.is_numeric_dtype(values) and not isinstance(values.dtype, pd.CategoricalDtype):
+                column = {'name': col, 'kind': 'numeric'}
+                data = values.to_numpy()
+            else:
+                categorical = pd.Categorical(values.astype(object))
+                column = {'name': col, 'kind': 'category', 'categories': [str(category) for category in categorical.categories]}
+                data = categorical.codes
+            manifest['columns'].append(column)
+            np.save(os.path.join(tmp_dir, f'{i}.npy'), data)
+
+        np.save(os.path.join(tmp_dir, 'index.npy'), table.index.to_numpy())
+        with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
+
+        self._remove_stale_entries(name, manifest['source_path'], entry_dir)
+        if os.path.exists(entry_dir):
+            shutil.rmtree(tmp_dir)
+        else:
+            os.replace(tmp_dir, entry_dir)
+
+    def _remove_stale_entries(self, name, source_path, current_entry_dir):
+        for entry in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, entry)
+            manifest_path = os.path.join(entry_dir, 'manifest.json')
+            if not entry.startswith(f'{name}-') or '.tmp-' in entry or entry_dir == current_entry_dir or not os.path.exists(manifest_path):
+                continue
+            with open(manifest_path) as f:
+                if json.load(f)['source_path'] == source_path:
+                    shutil.rmtree(entry_dir, ignore_errors=True)
@@ -0,0 +1,174 @@
+import hashlib
+import os
+
+import pandas as pd
+import numpy as np
+
+from data_cache import DataCache
+
+# Build the cleaned building data the models use from a raw benchmarking release from the City of Seattle,
+# e.g. data/input_data/Data cleaning/seattle_large_building_data_2019.csv. This replaces the Data cleaning notebook:
+#   building_data = clean_building_data_file('seattle_large_building_data_2020.csv', output_path='cleaned_2020.csv')
+#
+# Extra fields:
+# - OSE Building Type: the City's building type mapped to the generic types used by OSE (see city_building_types.csv),
+#   e.g. "NonResidential" and "Multifamily"
+# - OSE Property Use fields: EPA property use types mapped to the use types used by OSE (see building_activity_types.csv),
+#   e.g. "Hospital" or "Restaurant"
+# - Property Use Type GFA for Policy fields: the use type's GFA, unless it is a use type that isn't subject to the policy
+#   ("Data Center" and "Parking") or has no OSE use type, then 0
+# - Total GFA for Policy: sum of the Property Use Type GFA for Policy fields
+# - PropertyUseType Percent GFA fields: share of the Total GFA for Policy from each use type, 0 if there is none
+# - sq_ft_classification: the size class (A-F) of the Total GFA for Policy
+
+CLEANING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'input_data', 'Data cleaning')
+BUILDING_TYPES_PATH = os.path.join(CLEANING_DIR, 'city_building_types.csv')
+USE_TYPES_PATH = os.path.join(CLEANING_DIR, 'building_activity_types.csv')
+
+RAW_COLUMNS = [
+    'OSEBuildingID',
+    'TaxParcelIdentificationNumber',
+    'DataYear',
+    'BuildingType',
+    'BuildingName',
+    'NaturalGas(kBtu)',
+    'Electricity(kBtu)',
+    'SteamUse(kBtu)',
+    'PropertyGFATotal',
+    'PropertyGFABuilding(s)',
+    'PropertyGFAParking',
+    'LargestPropertyUseType',
+    'LargestPropertyUseTypeGFA',
+    'SecondLargestPropertyUseType',
+    'SecondLargestPropertyUseTypeGFA',
+    'ThirdLargestPropertyUseType',
+    'ThirdLargestPropertyUseTypeGFA',
+]
+
+USE_TYPE_PREFIXES = ['Largest', 'SecondLargest', 'ThirdLargest']
+
+# use types that aren't subject to the policy, so their GFA doesn't count
+USE_TYPES_NOT_COVERED = ['Data Center', 'Parking']
+
+# upper bounds (inclusive) of the GFA for Policy of each size class, from the smallest class up
+SIZE_CLASS_BINS = [-np.inf, 20000, 30000, 50000, 90000, 220000, np.inf]
+SIZE_CLASSES = ['F', 'E', 'D', 'C', 'B', 'A']
+
+def load_building_types_mapping(path=BUILDING_TYPES_PATH):
+    '''
+    Return a dict of the City's building types to OSE building types
+    '''
+    mapping = pd.read_csv(path)
+    return dict(zip(mapping['BuildingType (City classification)'], mapping['Type (Legislative classification)']))
+
+def load_use_types_mapping(path=USE_TYPES_PATH):
+    '''
+    Return a dict of EPA property use types to OSE use types
+    '''
+    mapping = pd.read_csv(path)
+    return dict(zip(mapping['EPA Building Type'], mapping['OSE Building Type']))
+
+def _map_values(values, mapping, description):
+    '''
+    Map a column with a dict, printing any values that aren't in the mapping (they become NaN)
+    '''
+    mapped = values.map(mapping)
+    unmapped = values[mapped.isna() & values.notna() & ~values.isin([key for key, value in mapping.items() if pd.isna(value)])]
+    if len(unmapped) > 0:
+        print(f'No {description} for: {", ".join(sorted(unmapped.astype(str).unique()))}')
+    return mapped
+
+def classify_sizes(sq_ft):
+    '''
+    Use letter classifications for building size instead of dealing with size ranges (>220k, 90-220k, etc.)
+    Buildings with no GFA are in the smallest class, F.
+    '''
+    size_classes = pd.cut(sq_ft, SIZE_CLASS_BINS, labels=SIZE_CLASSES, right=True)
+    return size_classes.astype(object).where(size_classes.notna(), 'F')
+
+def clean_building_data(raw_building_data, building_types=None, use_types=None):
+    '''
+    Return the cleaned building data for a raw benchmarking release, with one row per building.
+
+    building_types: dict of City building types to OSE building types, defaults to city_building_types.csv
+    use_types: dict of EPA property use types to OSE use types, defaults to building_activity_types.csv
+    '''
+    building_types = load_building_types_mapping() if building_types is None else building_types
+    use_types = load_use_types_mapping() if use_types is None else use_types
+
+    cleaned_building_data = raw_building_data[RAW_COLUMNS].copy()
+    cleaned_building_data['OSE Building Type'] = _map_values(cleaned_building_data['BuildingType'], building_types, 'OSE building type')
+    for prefix in USE_TYPE_PREFIXES:
+        cleaned_building_data[f'{prefix}PropertyUseType OSE'] = _map_values(cleaned_building_data[f'{prefix}PropertyUseType'], use_types, 'OSE use type')
+
+    # some buildings don't have a largest EPA use type at all
+    # we can't do anything about these buildings, so we'll drop them
+    cleaned_building_data = cleaned_building_data[cleaned_building_data['LargestPropertyUseType'].notna()].copy()
+
+    for prefix in USE_TYPE_PREFIXES:
+        use_type = cleaned_building_data[f'{prefix}PropertyUseType OSE']
+        is_covered = use_type.notna() & ~use_type.isin(USE_TYPES_NOT_COVERED)
+        cleaned_building_data[f'{prefix}PropertyUseType OSE GFA for Policy'] = cleaned_building_data[f'{prefix}PropertyUseTypeGFA'].where(is_covered, 0).fillna(0)
+
+    policy_gfa_columns = [f'{prefix}PropertyUseType OSE GFA for Policy' for prefix in USE_TYPE_PREFIXES]
+    total_gfa = cleaned_building_data[policy_gfa_columns].sum(axis=1)
+    cleaned_building_data['Total GFA for Policy'] = total_gfa
+
+    # percent of the building's GFA for Policy from each use type
+    policy_gfa = cleaned_building_data[policy_gfa_columns].to_numpy(dtype=float)
+    percent_gfa = np.zeros(policy_gfa.shape)
+    np.divide(policy_gfa, total_gfa.to_numpy()[:, np.newaxis], out=percent_gfa, where=total_gfa.to_numpy()[:, np.newaxis] > 0)
+    for i, prefix in enumerate(USE_TYPE_PREFIXES):
+        cleaned_building_data[f'{prefix}PropertyUseType Percent GFA'] = percent_gfa[:, i]
+
+    cleaned_building_data['sq_ft_classification'] = classify_sizes(total_gfa)
+    return cleaned_building_data
+
+def make_use_type_shares(cleaned_building_data):
+    '''
+    Return the cleaned building data's use types as a long format table, one row per building and listed use type,
+    for the models' use_type_shares_path. Rows can be added for buildings with more than three use types.
+    Empty use type columns are kept as rows without a use type, since they count towards when a building is due
+    (see use_type_weights.UseTypeWeights), so the table gives the same results as the building data.
+    '''
+    use_type_shares = pd.concat([
+        pd.DataFrame({
+            'OSEBuildingID': cleaned_building_data['OSEBuildingID'].to_numpy(),
+            'PropertyUseType OSE': cleaned_building_data[f'{prefix}PropertyUseType OSE'].to_numpy(dtype=object),
+            'PropertyUseType Percent GFA': cleaned_building_data[f'{prefix}PropertyUseType Percent GFA'].to_numpy(dtype=float),
+        }) for prefix in USE_TYPE_PREFIXES
+    ])
+    return use_type_shares.sort_values('OSEBuildingID', kind='stable', ignore_index=True)
+
+def _hash_files(*paths):
+    sha = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()[:12]
+
+def clean_building_data_file(raw_path, output_path=None, building_types_path=BUILDING_TYPES_PATH, use_types_path=USE_TYPES_PATH, cache_dir=None):
+    '''
+    Clean a raw benchmarking release file and return the cleaned building data, also saving it to output_path if given.
+
+    cache_dir: optional directory to cache the parsed raw file and the cleaned data in. The cleaned data is cached for
+        the raw file together with the mapping files, so editing any of them is a cache miss
+    '''
+    cache = DataCache(cache_dir) if cache_dir is not None else None
+    cleaned_name = f'cleaned_building_data-{_hash_files(building_types_path, use_types_path)}'
+
+    cleaned_building_data = cache.load(cleaned_name, raw_path) if cache is not None else None
+    if cleaned_building_data is None:
+        raw_building_data = cache.load('raw_building_data', raw_path) if cache is not None else None
+        if raw_building_data is None:
+            raw_building_data = pd.read_csv(raw_path, low_memory=False)
+            if cache is not None:
+                cache.save('raw_building_data', raw_path, raw_building_data[RAW_COLUMNS])
+
+        cleaned_building_data = clean_building_data(raw_building_data, load_building_types_mapping(building_types_path), load_use_types_mapping(use_types_path))
+        if cache is not None:
+            cache.save(cleaned_name, raw_path, cleaned_building_data)
+
+    if output_path is not None:
+        cleaned_building_data.to_csv(output_path)
+    return cleaned_building_data
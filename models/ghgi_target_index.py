@@ -0,0 +1,78 @@
+import pandas as pd
+import numpy as np
+
+class GHGITargetIndex:
+    def __init__(self, timeline):
+        '''
+        Compile a timeline of GHGI targets into a dense (year, sq ft classification, building type) array,
+        so targets can be looked up for whole arrays of buildings at once instead of scanning the timeline.
+
+        timeline: dataframe with year, building_type, sq_ft_classification and ghgi columns
+        '''
+        # the first timeline row wins if a year/type/size combination is listed more than once
+        timeline = timeline.dropna(subset=['year', 'building_type', 'sq_ft_classification'])
+        timeline = timeline.drop_duplicates(['year', 'building_type', 'sq_ft_classification'])
+
+        years = timeline['year'].to_numpy(dtype=int)
+        self.first_year = int(years.min()) if len(years) > 0 else 0
+        self.num_years = int(years.max()) - self.first_year + 1 if len(years) > 0 else 0
+        self.sq_ft_classes = pd.Index(sorted(timeline['sq_ft_classification'].unique()))
+        self.building_types = pd.Index(sorted(timeline['building_type'].unique()))
+
+        # NaN marks a year where the building type/size has no target yet
+        self.targets = np.full((self.num_years, len(self.sq_ft_classes), len(self.building_types)), np.nan)
+        self.targets[
+            years - self.first_year,
+            self.sq_ft_classes.get_indexer(timeline['sq_ft_classification']),
+            self.building_types.get_indexer(timeline['building_type']),
+        ] = timeline['ghgi'].to_numpy(dtype=float)
+
+    def encode_years(self, years):
+        '''
+        Return the position of each year in the index, or -1 for years outside the timeline.
+        '''
+        years = np.asarray(years, dtype=float)
+        year_codes = np.full(years.shape, -1, dtype=np.int64)
+        in_timeline = (years >= self.first_year) & (years < self.first_year + self.num_years)
+        year_codes[in_timeline] = years[in_timeline].astype(np.int64) - self.first_year
+        return year_codes
+
+    def encode_sq_ft_classes(self, sq_ft_classes):
+        '''
+        Return the position of each sq ft classification in the index, or -1 if the timeline doesn't list it.
+        '''
+        sq_ft_classes = np.asarray(sq_ft_classes, dtype=object)
+        return self.sq_ft_classes.get_indexer(pd.Index(sq_ft_classes.ravel())).reshape(sq_ft_classes.shape)
+
+    def encode_building_types(self, building_types):
+        '''
+        Return the position of each building type in the index, or -1 if the timeline doesn't list it.
+        '''
+        building_types = np.asarray(building_types, dtype=object)
+        return self.building_types.get_indexer(pd.Index(building_types.ravel())).reshape(building_types.shape)
+
+    def lookup_codes(self, year_codes, sq_ft_class_codes, building_type_codes):
+        '''
+        Look up targets for already encoded keys. The codes broadcast against each other,
+        so e.g. a column of years and a row of buildings returns a year x building array.
+        Keys with any -1 code return NaN.
+        '''
+        year_codes, sq_ft_class_codes, building_type_codes = np.broadcast_arrays(year_codes, sq_ft_class_codes, building_type_codes)
+        found = (year_codes >= 0) & (sq_ft_class_codes >= 0) & (building_type_codes >= 0)
+
+        targets = np.full(year_codes.shape, np.nan)
+        targets[found] = self.targets[year_codes[found], sq_ft_class_codes[found], building_type_codes[found]]
+        return targets
+
+    def lookup(self, years, sq_ft_classes, building_types):
+        '''
+        Find the GHGI target for arrays of years, sq ft classifications, and building types.
+        Returns NaN where the timeline has no target yet.
+        '''
+        return self.lookup_codes(self.encode_years(years), self.encode_sq_ft_classes(sq_ft_classes), self.encode_building_types(building_types))
+
+    def is_due(self, years, sq_ft_classes, building_types):
+        '''
+        Return True where a target applies to the year, sq ft classification, and building type.
+        '''
+        return ~np.isnan(self.lookup(years, sq_ft_classes, building_types))
@@ -0,0 +1,128 @@
+import pandas as pd
+import numpy as np
+
+class MonteCarloSimulation:
+    def __init__(self, model, factor_sigma=0.05, energy_use_sigma=0.1, seed=None, chunk_size=5):
+        '''
+        Sample uncertain emission factors and building energy use, and run the baseline calculation for every sample at once.
+
+        Each sample scales the emission factor path by a random walk in log space, so the uncertainty in the
+        factors grows each year, and scales each building's use of each energy source by a mean one lognormal draw.
+        The GHGI standards don't depend on the samples, so each building's city target is reduced once to a share of its
+        expected baseline plus a fixed part; each chunk of samples is then a batched matrix product and a minimum over
+        (sample x year x building) arrays. Only the yearly totals of each sample are kept.
+
+        model: a BaselineBEPSModel (or subclass) with the inputs to sample around
+        factor_sigma: standard deviation of the yearly step of the log emission factors, a number or one per energy source
+            (electricity, steam, gas)
+        energy_use_sigma: standard deviation of the log of each building's energy use, a number or one per energy source
+        seed: seed for the random numbers; the same seed and chunk_size give the same samples
+        chunk_size: number of samples calculated at a time, which bounds memory to a few chunk_size x years x buildings arrays.
+            Small chunks keep those arrays in the CPU cache
+        '''
+        self.model = model
+        self.factor_sigma = np.broadcast_to(np.asarray(factor_sigma, dtype=float), (len(model.ENERGY_USE_COLUMNS),))
+        self.energy_use_sigma = np.broadcast_to(np.asarray(energy_use_sigma, dtype=float), (len(model.ENERGY_USE_COLUMNS),))
+        self.seed = seed
+        self.chunk_size = chunk_size
+
+    def _sample_chunk(self, rng, num_samples, energy_use, emission_factors):
+        '''
+        Return sampled energy use (sample x building x source) and emission factors (sample x year x source)
+        '''
+        num_years, num_sources = emission_factors.shape
+        factor_steps = rng.normal(0, self.factor_sigma, size=(num_samples, num_years, num_sources))
+        factor_multipliers = np.exp(np.cumsum(factor_steps, axis=1))
+
+        # lognormal with mean one, built in place
+        energy_use_multipliers = rng.standard_normal(size=(num_samples, len(energy_use), num_sources))
+        energy_use_multipliers *= self.energy_use_sigma
+        energy_use_multipliers -= self.energy_use_sigma ** 2 / 2
+        np.exp(energy_use_multipliers, out=energy_use_multipliers)
+
+        return energy_use * energy_use_multipliers, emission_factors * factor_multipliers
+
+    def _calculate_chunk(self, sampled_energy_use, sampled_factors, baseline_share, fixed_target_emissions, buffers):
+        '''
+        Return the yearly expected baseline and compliant emissions totals (sample x year) for a chunk of samples.
+        buffers are two (chunk_size x year x building) arrays reused by every chunk, which saves allocating them each time
+        '''
+        num_samples = len(sampled_factors)
+        expected_baselines, compliant_emissions = [buffer[:num_samples] for buffer in buffers]
+
+        # (sample x year x source) @ (sample x source x building) gives the (sample x year x building) expected baselines
+        np.matmul(sampled_factors, sampled_energy_use.transpose(0, 2, 1), out=expected_baselines)
+
+        # compliant emissions are the lower of the expected baseline and the city target times GFA
+        np.multiply(expected_baselines, baseline_share, out=compliant_emissions)
+        compliant_emissions += fixed_target_emissions
+        np.minimum(compliant_emissions, expected_baselines, out=compliant_emissions)
+
+        # the total expected baseline only needs each source's total energy use
+        total_expected_baselines = np.matmul(sampled_factors, sampled_energy_use.sum(axis=1)[:, :, np.newaxis])[:, :, 0]
+
+        return total_expected_baselines, compliant_emissions.sum(axis=2)
+
+    def run(self, num_samples, start_year=2027, end_year=2050):
+        '''
+        Calculate num_samples samples of the baseline model between start_year and end_year (inclusive).
+        The yearly totals of every sample are kept as expected_baselines and compliant_emissions (sample x year dataframes).
+        '''
+        model = self.model
+        model._prepare_input_data()
+
+        years = np.arange(start_year, end_year + 1)
+        ids = model.building_data['OSEBuildingID'].to_numpy()
+        gfa = model.buildings.gfas(ids)
+        standards = model._get_use_type_standards(years[:, np.newaxis], ids)
+
+        # a building's city target is its baseline GHGI for the share of its GFA with no standard yet, plus the standards
+        # for the rest, so its target emissions are expected baseline * baseline_share + fixed_target_emissions.
+        # Buildings without GFA have no expected GHGI, so they don't emit anything
+        has_gfa = gfa != 0
+        baseline_share = standards.get_baseline_shares() * has_gfa
+        fixed_target_emissions = standards.get_target_ghgis() * gfa
+
+        energy_use = model.building_data[model.ENERGY_USE_COLUMNS].to_numpy(dtype=float) * has_gfa[:, np.newaxis]
+        emission_factors = model.energy_emissions.loc[years, model.EMISSION_FACTOR_COLUMNS].to_numpy(dtype=float)
+
+        # one independent random stream per chunk, so results only depend on the seed and the chunk size
+        chunk_starts = range(0, num_samples, self.chunk_size)
+        seeds = np.random.SeedSequence(self.seed).spawn(len(chunk_starts))
+
+        buffers = [np.empty((min(self.chunk_size, num_samples), len(years), len(ids))) for _ in range(2)]
+        expected_baselines = np.empty((num_samples, len(years)))
+        compliant_emissions = np.empty((num_samples, len(years)))
+        for chunk_start, seed in zip(chunk_starts, seeds):
+            chunk = slice(chunk_start, min(chunk_start + self.chunk_size, num_samples))
+            rng = np.random.default_rng(seed)
+            sampled_energy_use, sampled_factors = self._sample_chunk(rng, chunk.stop - chunk.start, energy_use, emission_factors)
+            expected_baselines[chunk], compliant_emissions[chunk] = self._calculate_chunk(sampled_energy_use, sampled_factors, baseline_share, fixed_target_emissions, buffers)
+
+        columns = pd.Index(years, name='year')
+        self.expected_baselines = pd.DataFrame(expected_baselines, columns=columns).rename_axis('sample')
+        self.compliant_emissions = pd.DataFrame(compliant_emissions, columns=columns).rename_axis('sample')
+
+        print(f'Monte Carlo calculations complete for {num_samples} samples. Get percentile bands with get_emissions_percentiles() and get_reduction_percentiles()')
+
+    def get_emissions_percentiles(self, percentiles=(5, 50, 95)):
+        '''
+        Return percentiles of total compliant emissions across the samples, one row per year and one column per percentile.
+        '''
+        bands = np.percentile(self.compliant_emissions.to_numpy(), percentiles, axis=0)
+        return pd.DataFrame(bands.T, index=self.compliant_emissions.columns, columns=pd.Index(percentiles, name='percentile'))
+
+    def get_percent_emissions_reductions(self, year=2040):
+        '''
+        Return each sample's percent reduction in the given year from its own 2027 baseline.
+        '''
+        # 2026 emissions are the same as the 2027 baseline
+        baseline_2026 = self.expected_baselines[2027]
+        return 1 - (self.compliant_emissions[year] / baseline_2026)
+
+    def get_reduction_percentiles(self, year=2040, percentiles=(5, 50, 95)):
+        '''
+        Return percentiles of the percent emissions reduction in the given year across the samples.
+        '''
+        reductions = self.get_percent_emissions_reductions(year)
+        return pd.Series(np.percentile(reductions.to_numpy(), percentiles), index=pd.Index(percentiles, name='percentile'), name=year)
@@ -0,0 +1,95 @@
+import copy
+import multiprocessing
+import os
+
+import pandas as pd
+
+from baseline_model import BaselineBEPSModel
+
+# The model with the shared input data, set once in each worker process by _init_worker
+_template_model = None
+
+def _init_worker(template_model):
+    global _template_model
+    _template_model = template_model
+
+def apply_scenario(model, scenario):
+    '''
+    Point a copy of the template model at a scenario's inputs. Only the inputs the scenario changes are reloaded;
+    the building data and everything else stays shared with the template.
+    '''
+    if 'timeline_path' in scenario and scenario['timeline_path'] != model.timeline_path:
+        model.timeline_path = scenario['timeline_path']
+        model._load_timeline_data()
+        model._apply_dtype_schema()
+    if 'emissions_path' in scenario and scenario['emissions_path'] != model.emissions_path:
+        model.emissions_path = scenario['emissions_path']
+        model._load_emissions_data()
+
+    model.fine_years = scenario.get('fine_years', model.fine_years)
+    model.fine_per_sqft = scenario.get('fine_per_sqft', model.fine_per_sqft)
+    model._target_scale_panels = {}
+
+def _aggregate_by_year(scenario_results):
+    '''
+    Sum every calculated emissions and fee column by year.
+    '''
+    value_cols = [col for col in scenario_results.columns if col != 'year' and ('emissions' in col or col in ('expected_baseline', 'compliance_fees'))]
+    return scenario_results.groupby('year')[value_cols].sum()
+
+def _run_scenario(args):
+    scenario, start_year, end_year = args
+    model = copy.copy(_template_model)
+    apply_scenario(model, scenario)
+    scenario_results = model._calculate_model_without_saving(start_year, end_year)
+    return scenario['name'], _aggregate_by_year(scenario_results)
+
+class ParallelScenarioRunner:
+    def __init__(self, emissions_path, timeline_path, building_data_path, fine_years, fine_per_sqft, model_class=BaselineBEPSModel, workers=None, cache_dir=None):
+        '''
+        Run many scenarios of a model across processes. The input data is loaded and cleaned once here and shipped
+        to each worker once: on platforms that fork, workers share it copy-on-write, elsewhere it is pickled once per worker.
+
+        emissions_path, timeline_path, building_data_path, fine_years, fine_per_sqft: defaults for every scenario, as in BaselineBEPSModel
+        model_class: BaselineBEPSModel or a subclass, e.g. AlternativeComplianceModel
+        workers: number of worker processes, defaults to the number of CPUs. With 1 worker, scenarios run in this process
+        cache_dir: optional directory to cache the loaded and cleaned input tables in
+        '''
+        self.model_class = model_class
+        self.workers = workers if workers is not None else os.cpu_count()
+
+        self.template_model = model_class(emissions_path, timeline_path, building_data_path, fine_years, fine_per_sqft, cache_dir=cache_dir)
+        self.template_model._prepare_input_data()
+
+    def _make_pool(self):
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        return context.Pool(self.workers, initializer=_init_worker, initargs=(self.template_model,))
+
+    def run(self, scenarios, start_year, end_year):
+        '''
+        Run each scenario and yield (name, emissions and fees by year) as scenarios finish, in the order they were given.
+
+        scenarios: list of dicts with a name and any of timeline_path, emissions_path, fine_years and fine_per_sqft;
+            anything left out uses the runner's defaults
+        start_year: year to begin calculations (inclusive)
+        end_year: year to end calculations (inclusive)
+        '''
+        tasks = [(scenario, start_year, end_year) for scenario in scenarios]
+
+        if self.workers == 1:
+            _init_worker(self.template_model)
+            for task in tasks:
+                yield _run_scenario(task)
+            return
+
+        with self._make_pool() as pool:
+            for result in pool.imap(_run_scenario, tasks):
+                yield result
+
+    def run_all(self, scenarios, start_year, end_year):
+        '''
+        Run every scenario and return one dataframe of emissions and fees indexed by scenario and year.
+        '''
+        results = list(self.run(scenarios, start_year, end_year))
+        return pd.concat([aggregates for _, aggregates in results], keys=[name for name, _ in results], names=['scenario'])
@@ -0,0 +1,177 @@
+import json
+import os
+import urllib.parse
+
+import pandas as pd
+import numpy as np
+
+from schema import COMPLIANCE_STATUS_DTYPE, ID_DTYPE, YEAR_DTYPE, make_compliance_statuses
+
+class PartitionedResultWriter:
+    MANIFEST_NAME = 'manifest.json'
+    BUILDINGS_NAME = 'buildings.npz'
+
+    def __init__(self, output_dir, building_info_columns=None):
+        '''
+        Write scenario results to a directory in a compressed columnar format, one file per scenario and year:
+        output_dir/scenario=<name>/year=<year>.npz, with one compressed array per column. Each scenario is written
+        straight from the model's (year x building) arrays as soon as it is calculated, so a sweep never holds more
+        than one scenario's results or builds the per-row dataframe. The buildings' descriptive columns are written
+        once, to buildings.npz, instead of on every row. Read the results back with read_partitioned_results.
+
+        output_dir: directory to write to. Scenarios already written there are kept, and replaced if written again
+        building_info_columns: building data columns to write to buildings.npz, defaults to the model's BUILDING_INFO_COLUMNS
+        '''
+        self.output_dir = output_dir
+        self.building_info_columns = building_info_columns
+        os.makedirs(output_dir, exist_ok=True)
+
+        manifest_path = os.path.join(output_dir, self.MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {'scenarios': {}, 'columns': [], 'compliance_statuses': list(COMPLIANCE_STATUS_DTYPE.categories)}
+
+    def _scenario_dir(self, scenario):
+        return os.path.join(self.output_dir, f'scenario={urllib.parse.quote(str(scenario), safe="")}')
+
+    def _write_buildings(self, model, ids):
+        '''
+        Write each building's descriptive columns, with strings stored as categorical codes
+        '''
+        columns = self.building_info_columns or model.BUILDING_INFO_COLUMNS
+        building_info = model.building_data.drop_duplicates('OSEBuildingID')[columns]
+        building_info = building_info.iloc[model.buildings.positions(ids)]
+
+        arrays = {}
+        categories = {}
+        for i, col in enumerate(columns):
+            values = building_info[col]
+            if pd.api.types.is_numeric_dtype(values) and not isinstance(values.dtype, pd.CategoricalDtype):
+                arrays[f'column_{i}'] = values.to_numpy()
+            else:
+                categorical = pd.Categorical(values.astype(object))
+                arrays[f'column_{i}'] = categorical.codes
+                categories[col] = [str(category) for category in categorical.categories]
+
+        np.savez_compressed(os.path.join(self.output_dir, self.BUILDINGS_NAME), **arrays)
+        self.manifest['building_columns'] = columns
+        self.manifest['building_categories'] = categories
+
+    def write(self, scenario, model):
+        '''
+        Write a calculated model's results as the given scenario. The model must have been calculated, lazily or not.
+        '''
+        results = model.results
+        if 'building_columns' not in self.manifest:
+            self._write_buildings(model, results.ids)
+
+        columns = [col for col in results.panel if col not in ('OSEBuildingID', 'year')]
+        scenario_dir = self._scenario_dir(scenario)
+        os.makedirs(scenario_dir, exist_ok=True)
+
+        ids = results.ids.astype(ID_DTYPE)
+        for row, year in enumerate(results.years):
+            arrays = {'OSEBuildingID': ids}
+            for col in columns:
+                arrays[col] = results.get_year_values(col, row)
+            np.savez_compressed(os.path.join(scenario_dir, f'year={int(year)}.npz'), **arrays)
+
+        # the manifest is rewritten after every scenario, so it lists every scenario that was written completely
+        self.manifest['columns'] = list(dict.fromkeys(self.manifest['columns'] + columns))
+        self.manifest['scenarios'][str(scenario)] = {'years': [int(year) for year in results.years], 'columns': columns}
+        with open(os.path.join(self.output_dir, self.MANIFEST_NAME), 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+
+def read_partitioned_results(output_dir, scenarios=None, years=None, with_building_info=False):
+    '''
+    Read results written by PartitionedResultWriter into one dataframe with scenario and year columns.
+    Only the partitions for the given scenarios and years are read.
+
+    with_building_info: add each building's descriptive columns to every row
+    '''
+    with open(os.path.join(output_dir, PartitionedResultWriter.MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+
+    scenario_names = list(manifest['scenarios']) if scenarios is None else [str(scenario) for scenario in scenarios]
+    frames = []
+    for scenario in scenario_names:
+        scenario_dir = os.path.join(output_dir, f'scenario={urllib.parse.quote(scenario, safe="")}')
+        for year in manifest['scenarios'][scenario]['years']:
+            if years is not None and year not in years:
+                continue
+            with np.load(os.path.join(scenario_dir, f'year={year}.npz')) as partition:
+                columns = {col: partition[col] for col in partition.files}
+            num_rows = len(columns['OSEBuildingID'])
+            frame = {'scenario': np.full(num_rows, scenario, dtype=object), 'year': np.full(num_rows, year, dtype=YEAR_DTYPE)}
+            frame.update(columns)
+            frames.append(pd.DataFrame(frame))
+
+    results = pd.concat(frames, ignore_index=True)
+    results['scenario'] = pd.Categorical(results['scenario'], categories=scenario_names)
+    if 'compliance_status' in results.columns:
+        results['compliance_status'] = make_compliance_statuses(results['compliance_status'].to_numpy())
+
+    if with_building_info:
+        building_info = read_building_info(output_dir, manifest)
+        positions = pd.Index(building_info['OSEBuildingID']).get_indexer(results['OSEBuildingID'])
+        building_info = building_info.drop(columns='OSEBuildingID').iloc[positions].reset_index(drop=True)
+        results = pd.concat([results, building_info], axis=1)
+
+    return results
+
+def read_building_info(output_dir, manifest=None):
+    '''
+    Read the buildings' descriptive columns written by PartitionedResultWriter.
+    '''
+    if manifest is None:
+        with open(os.path.join(output_dir, PartitionedResultWriter.MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+
+    columns = {}
+    with np.load(os.path.join(output_dir, PartitionedResultWriter.BUILDINGS_NAME)) as buildings:
+        for i, col in enumerate(manifest['building_columns']):
+            values = buildings[f'column_{i}']
+            if col in manifest['building_categories']:
+                values = pd.Categorical.from_codes(values, categories=manifest['building_categories'][col])
+            columns[col] = values
+    return pd.DataFrame(columns)
+
+class SummaryCSVWriter:
+    # by year totals written for every scenario, along with every emissions column the model calculates
+    SUMMARY_COLUMNS = ['expected_baseline', 'compliant_emissions', 'compliance_fees']
+
+    def __init__(self, path):
+        '''
+        Write the by year totals of many scenarios to one CSV file, appending each scenario's rows as it finishes.
+        Totals are summed from the model's arrays and rounded to whole kg and dollars to keep the file small.
+        '''
+        self.path = path
+        self._wrote_header = False
+
+    def _get_summary_columns(self, results):
+        '''
+        Return the columns to total: SUMMARY_COLUMNS, with any other emissions columns (e.g. the alternative compliance
+        model's alternative_compliant_emissions) after compliant_emissions
+        '''
+        emissions_columns = [col for col in results.panel if col.endswith('emissions')]
+        columns = ['expected_baseline'] + emissions_columns + [col for col in self.SUMMARY_COLUMNS if col not in emissions_columns and col != 'expected_baseline']
+        return [col for col in columns if col in results.panel], emissions_columns
+
+    def write(self, scenario, model):
+        '''
+        Append a calculated model's totals by year as the given scenario, and the percent emissions reduction
+        from the 2027 baseline of each emissions column (percent_emissions_reduction for compliant_emissions).
+        '''
+        results = model.results
+        columns, emissions_columns = self._get_summary_columns(results)
+        summary = pd.DataFrame({col: results.get_total_by_year(col).round().astype(np.int64) for col in columns})
+        for col in emissions_columns:
+            name = 'percent_emissions_reduction' if col == 'compliant_emissions' else f'percent_{col}_reduction'
+            summary[name] = np.round([results.get_percent_emissions_reduction_by_given_year(year, col) for year in results.years], 6) + 0.0
+        summary = summary.reset_index()
+        summary.insert(0, 'scenario', scenario)
+
+        summary.to_csv(self.path, mode='a' if self._wrote_header else 'w', header=not self._wrote_header, index=False)
+        self._wrote_header = True
@@ -0,0 +1,174 @@
+import pandas as pd
+import numpy as np
+
+# rule set parameters, and their defaults: buildings make no changes
+DEFAULT_RULES = {
+    # yearly reduction in every building's use of every energy source, e.g. 0.01 for 1% a year
+    'efficiency_rate': 0.0,
+    # years a building that isn't compliant acts, defaults to the model's fine years
+    'deadline_years': None,
+    # one-off reduction in energy use when a building acts at a deadline
+    'deadline_efficiency': 0.0,
+    # share of the building's remaining gas and steam switched to electricity when it acts at a deadline
+    'electrification_share': 0.0,
+    # number of deadlines a building acts at before it switches all of its gas and steam, None for never
+    'full_electrification_after': None,
+    # year every building switches all of its gas and steam, None for never
+    'full_electrification_year': None,
+    # kBtu of electricity that replaces each kBtu of gas or steam, e.g. about 0.3 for heat pumps replacing gas boilers
+    'electrification_ratio': 1.0,
+}
+
+class RetrofitPathwaySimulator:
+    def __init__(self, model, rule_sets):
+        '''
+        Evolve every building's electricity, steam and gas use year by year under rule based retrofits, for many rule sets at once.
+
+        Each year, every building's energy use first drops by the efficiency rate. Buildings that aren't compliant
+        in a deadline year then act: they cut their energy use by the deadline efficiency and switch a share of their
+        gas and steam to electricity, or all of it once they have acted full_electrification_after times. Actions take
+        effect in the year they are taken. A building is compliant when its GHGI under its current energy use is below
+        its city target, with use types that have no standard yet held to that GHGI, as in the baseline model.
+
+        The state is a (rule set x building x source) array of energy use, updated in place by masked array operations,
+        so each year is a handful of array operations over every rule set and building, however many rule sets there are.
+
+        model: a BaselineBEPSModel (or subclass) with the buildings, emission factors and standards to use
+        rule_sets: dict of rule set name to dict of rules, see DEFAULT_RULES. Missing rules take their default
+        '''
+        self.model = model
+        self.rule_sets = {}
+        for name, rules in rule_sets.items():
+            unknown = set(rules) - set(DEFAULT_RULES)
+            if unknown:
+                raise ValueError(f'Unknown rules for rule set {name!r}: {", ".join(sorted(unknown))}')
+            self.rule_sets[name] = {**DEFAULT_RULES, **rules}
+
+    def _get_rule(self, rule, default=np.nan):
+        '''
+        Return a rule's value for every rule set as an array, with default in place of None
+        '''
+        return np.array([default if rules[rule] is None else rules[rule] for rules in self.rule_sets.values()], dtype=float)
+
+    def _get_deadlines(self, years):
+        '''
+        Return a (rule set x year) array, True in each rule set's deadline years
+        '''
+        deadlines = [self.model.fine_years if rules['deadline_years'] is None else rules['deadline_years'] for rules in self.rule_sets.values()]
+        return np.stack([np.isin(years, np.asarray(deadline_years, dtype=np.int64)) for deadline_years in deadlines]) if deadlines else np.zeros((0, len(years)), dtype=bool)
+
+    def _electrify(self, energy_use, share, ratio):
+        '''
+        Switch share (rule set x building) of each building's gas and steam use to electricity, in place
+        '''
+        switched = energy_use[:, :, self.fossil_sources] * share[:, :, np.newaxis]
+        energy_use[:, :, self.fossil_sources] -= switched
+        energy_use[:, :, self.electricity_source] += switched.sum(axis=2) * ratio
+
+    def _get_compliance(self, energy_use, emission_factors, gfa, standards, is_due):
+        '''
+        Return the (rule set x building) emissions and whether each building is due and not compliant
+        '''
+        # summed one energy source at a time, like the model's expected baselines, so ties with the city target break the same way
+        emissions = np.zeros(energy_use.shape[:2])
+        for i in range(len(emission_factors)):
+            emissions += energy_use[:, :, i] * emission_factors[i]
+        ghgi = self.model._get_expected_baseline_ghgis(emissions, gfa)
+        city_ghgi = standards.get_city_ghgis(ghgi)
+        return emissions, is_due & ~(ghgi < city_ghgi)
+
+    def run(self, start_year=2027, end_year=2050):
+        '''
+        Simulate every rule set between start_year and end_year (inclusive).
+        The yearly totals of every rule set are kept as pathways, a dataframe indexed by rule set and year with the
+        total emissions and energy use of every building, and the number of non-compliant and all electric buildings.
+        Each building's energy use in the last year is kept as final_energy_use, see get_final_energy_use.
+        '''
+        model = self.model
+        model._prepare_input_data()
+
+        sources = model.ENERGY_USE_COLUMNS
+        self.electricity_source = sources.index('Electricity(kBtu)')
+        self.fossil_sources = [i for i, source in enumerate(sources) if i != self.electricity_source]
+
+        years = np.arange(start_year, end_year + 1)
+        ids = model.building_data['OSEBuildingID'].to_numpy()
+        gfa = model.buildings.gfas(ids)
+        standards = model._get_use_type_standards(years[:, np.newaxis], ids)
+        is_due = standards.is_due()
+        emission_factors = model.energy_emissions.loc[years, model.EMISSION_FACTOR_COLUMNS].to_numpy(dtype=float)
+
+        efficiency_rate = self._get_rule('efficiency_rate')[:, np.newaxis, np.newaxis]
+        deadline_efficiency = self._get_rule('deadline_efficiency')[:, np.newaxis]
+        electrification_share = self._get_rule('electrification_share')[:, np.newaxis]
+        full_electrification_after = self._get_rule('full_electrification_after', np.inf)[:, np.newaxis]
+        full_electrification_year = self._get_rule('full_electrification_year')
+        electrification_ratio = self._get_rule('electrification_ratio')[:, np.newaxis]
+        is_deadline = self._get_deadlines(years)
+
+        num_rule_sets = len(self.rule_sets)
+        energy_use = np.broadcast_to(model.building_data[sources].to_numpy(dtype=float), (num_rule_sets, len(ids), len(sources))).copy()
+        times_acted = np.zeros((num_rule_sets, len(ids)))
+
+        totals = np.zeros((num_rule_sets, len(years), len(sources)))
+        total_emissions = np.zeros((num_rule_sets, len(years)))
+        non_compliant_buildings = np.zeros((num_rule_sets, len(years)), dtype=np.int64)
+        all_electric_buildings = np.zeros((num_rule_sets, len(years)), dtype=np.int64)
+        for row, year in enumerate(years):
+            if row > 0:
+                energy_use *= 1 - efficiency_rate
+
+            is_full_electrification_year = (full_electrification_year == year)[:, np.newaxis]
+            if is_full_electrification_year.any():
+                self._electrify(energy_use, np.broadcast_to(is_full_electrification_year, times_acted.shape).astype(float), electrification_ratio)
+
+            year_standards = standards.select([row], np.arange(len(ids)))
+            emissions, non_compliant = self._get_compliance(energy_use, emission_factors[row], gfa, year_standards, is_due[row])
+            acts = non_compliant & is_deadline[:, row, np.newaxis]
+            if acts.any():
+                times_acted += acts
+                energy_use *= 1 - np.where(acts, deadline_efficiency, 0)[:, :, np.newaxis]
+                share = np.where(times_acted >= full_electrification_after, 1.0, electrification_share)
+                self._electrify(energy_use, np.where(acts, share, 0), electrification_ratio)
+                emissions, non_compliant = self._get_compliance(energy_use, emission_factors[row], gfa, year_standards, is_due[row])
+
+            totals[:, row] = energy_use.sum(axis=1)
+            total_emissions[:, row] = emissions.sum(axis=1)
+            non_compliant_buildings[:, row] = non_compliant.sum(axis=1)
+            all_electric_buildings[:, row] = ((energy_use[:, :, self.fossil_sources].sum(axis=2) == 0) & (energy_use.sum(axis=2) > 0)).sum(axis=1)
+
+        names = list(self.rule_sets)
+        index = pd.MultiIndex.from_product([names, years], names=['rule_set', 'year'])
+        pathways = pd.DataFrame({'emissions': total_emissions.ravel()}, index=index)
+        for i, source in enumerate(sources):
+            pathways[source] = totals[:, :, i].ravel()
+        pathways['non_compliant_buildings'] = non_compliant_buildings.ravel()
+        pathways['all_electric_buildings'] = all_electric_buildings.ravel()
+        self.pathways = pathways
+
+        self.ids = ids
+        self.final_energy_use = energy_use
+        print(f'Retrofit pathways complete for {num_rule_sets} rule sets. Get yearly totals with get_emissions_by_year() or pathways')
+
+    def get_emissions_by_year(self):
+        '''
+        Return total emissions as a (rule set x year) dataframe
+        '''
+        return self.pathways['emissions'].unstack('year').loc[list(self.rule_sets)]
+
+    def get_percent_emissions_reductions(self, year=2040):
+        '''
+        Return each rule set's percent reduction in the given year from the 2027 expected baseline.
+        '''
+        # 2026 emissions are the same as the 2027 baseline
+        self.model._prepare_input_data()
+        energy_use = self.model.building_data[self.model.ENERGY_USE_COLUMNS].to_numpy(dtype=float).sum(axis=0)
+        baseline_2026 = energy_use @ self.model.energy_emissions.loc[2027, self.model.EMISSION_FACTOR_COLUMNS].to_numpy(dtype=float)
+        return 1 - (self.get_emissions_by_year()[year] / baseline_2026)
+
+    def get_final_energy_use(self, rule_set):
+        '''
+        Return each building's energy use in the last simulated year under a rule set, indexed by OSEBuildingID
+        '''
+        position = list(self.rule_sets).index(rule_set)
+        return pd.DataFrame(self.final_energy_use[position], index=pd.Index(self.ids, name='OSEBuildingID'), columns=self.model.ENERGY_USE_COLUMNS)
@@ -0,0 +1,209 @@
+from collections.abc import Mapping
+
+import pandas as pd
+import numpy as np
+
+from scenario_results import ScenarioResults
+from schema import COMPLIANCE_STATUS_DTYPE
+
+class RunLengthColumn:
+    def __init__(self, values):
+        '''
+        A (year x building) array stored as runs: for each building, the years its value stays the same.
+        Runs are ordered by building and then by year, so each building's runs are contiguous.
+
+        values: (year x building) array to encode
+        '''
+        self.num_years, self.num_buildings = values.shape
+        self.dtype = values.dtype
+
+        by_building = values.T
+        changes = np.ones(by_building.shape, dtype=bool)
+        changes[:, 1:] = by_building[:, 1:] != by_building[:, :-1]
+        if np.issubdtype(self.dtype, np.floating):
+            # NaN never equals itself, but a run of NaN is still one run
+            changes[:, 1:] &= ~(np.isnan(by_building[:, 1:]) & np.isnan(by_building[:, :-1]))
+
+        # only each run's first year and value are kept; its building and last year follow from the runs around it
+        buildings, starts = np.nonzero(changes)
+        self.starts = starts.astype(np.int16 if self.num_years <= np.iinfo(np.int16).max else np.int32)
+        self.values = by_building[buildings, starts]
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(buildings, minlength=self.num_buildings))])
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def nbytes(self):
+        return self.starts.nbytes + self.values.nbytes + self.indptr.nbytes
+
+    def _buildings(self):
+        return np.repeat(np.arange(self.num_buildings), np.diff(self.indptr))
+
+    def _ends(self):
+        '''
+        Return the year row after each run's last year: where the building's next run starts, or the number of years
+        '''
+        ends = np.append(self.starts[1:], 0).astype(np.int64)
+        ends[self.indptr[1:][np.diff(self.indptr) > 0] - 1] = self.num_years
+        return ends
+
+    def get_runs(self):
+        '''
+        Return each run's building position, first year row, the year row after its last year, and value
+        '''
+        return self._buildings(), self.starts.astype(np.int64), self._ends(), self.values
+
+    def expand(self):
+        '''
+        Return the full (year x building) array
+        '''
+        by_building = np.repeat(self.values, self._ends() - self.starts).reshape(self.num_buildings, self.num_years)
+        return np.ascontiguousarray(by_building.T)
+
+    def get_year(self, row):
+        '''
+        Return every building's value in one year, by the year's row
+        '''
+        runs_started = np.bincount(self._buildings()[self.starts <= row], minlength=self.num_buildings)
+        return self.values[self.indptr[:-1] + runs_started - 1]
+
+    def _accumulate(self, values, groups, num_groups):
+        '''
+        Sum values per run for each year and group of runs (-1 for none). Runs over the same years are summed
+        together first, then each year adds up the sums of the year ranges that cover it, as one matrix product.
+        Returns a (year x group) array
+        '''
+        in_group = groups >= 0
+        starts, ends = self.starts[in_group].astype(np.int64), self._ends()[in_group]
+        ranges, range_codes = np.unique(starts * (self.num_years + 1) + ends, return_inverse=True)
+        range_sums = np.bincount(groups[in_group] * len(ranges) + range_codes, weights=values[in_group], minlength=num_groups * len(ranges))
+
+        year_rows = np.arange(self.num_years)
+        covers = (ranges[:, np.newaxis] // (self.num_years + 1) <= year_rows) & (year_rows < ranges[:, np.newaxis] % (self.num_years + 1))
+        return (range_sums.reshape(num_groups, len(ranges)) @ covers).T
+
+    def count_by_year(self, value):
+        '''
+        Return the number of buildings with the given value in each year
+        '''
+        is_value = (self.values == value).astype(float)
+        counts = self._accumulate(is_value, np.zeros(len(self.values), dtype=np.int64), 1)[:, 0]
+        return np.rint(counts).astype(np.int64)
+
+    def sum_by_year(self, codes=None, num_groups=1):
+        '''
+        Sum the runs' values in each year, without expanding them.
+
+        codes: optional group of each building, -1 to leave it out, to sum each group separately
+        Returns a (year x group) array
+        '''
+        groups = np.zeros(len(self.values), dtype=np.int64) if codes is None else codes[self._buildings()].astype(np.int64)
+        return self._accumulate(self.values.astype(float), groups, num_groups)
+
+class RunLengthPanel(Mapping):
+    def __init__(self, columns, dense, runs):
+        '''
+        Read-only dict of column name to (year x building) array, where the run length encoded columns are only
+        expanded when they are looked up.
+
+        columns: every column name, in order
+        dense: dict of column name to (year x building) array
+        runs: dict of column name to RunLengthColumn
+        '''
+        self.columns = list(columns)
+        self.dense = dense
+        self.runs = runs
+
+    def __getitem__(self, column):
+        if column in self.runs:
+            return self.runs[column].expand()
+        return self.dense[column]
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self):
+        return len(self.columns)
+
+class RunLengthResults(ScenarioResults):
+    # columns that only change when a building's target or compliance changes
+    RUN_LENGTH_COLUMNS = ['city_ghgi_target', 'compliant_ghgi', 'compliant_emissions', 'compliance_status']
+
+    def __init__(self, model, years, panel, columns=None):
+        '''
+        A model's results with the columns that stay the same for years at a time stored as runs of years per building,
+        so they take memory in proportion to how often each building's values change rather than to the number of years.
+        Totals by year are summed straight from the runs; a column's full (year x building) array is only built when it
+        is looked up in results.panel, or when to_frame is called.
+
+        model, years, panel: as in ScenarioResults
+        columns: panel columns to store as runs, defaults to RUN_LENGTH_COLUMNS
+        '''
+        columns = self.RUN_LENGTH_COLUMNS if columns is None else columns
+        runs = {col: RunLengthColumn(values) for col, values in panel.items() if col in columns}
+        dense = {col: values for col, values in panel.items() if col not in runs}
+        ScenarioResults.__init__(self, model, years, RunLengthPanel(panel, dense, runs))
+
+    @property
+    def runs(self):
+        return self.panel.runs
+
+    def get_memory_usage(self):
+        '''
+        Return the bytes used by each run length encoded column, next to the bytes its full array would use.
+        '''
+        return pd.DataFrame({
+            'runs': {col: len(column) for col, column in self.runs.items()},
+            'run_length_bytes': {col: column.nbytes for col, column in self.runs.items()},
+            'full_bytes': {col: column.num_years * column.num_buildings * column.dtype.itemsize for col, column in self.runs.items()},
+        })
+
+    def get_year_values(self, column, row):
+        if column in self.runs:
+            return self.runs[column].get_year(row)
+        return ScenarioResults.get_year_values(self, column, row)
+
+    def get_total_by_year(self, column='compliant_emissions'):
+        if column not in self.runs:
+            return ScenarioResults.get_total_by_year(self, column)
+
+        def calculate():
+            is_covered = self.model.buildings.sq_ft_classes(self.ids) != 'F'
+            return pd.Series(self.runs[column].sum_by_year(codes=np.where(is_covered, 0, -1))[:, 0], index=self._year_index(), name=column)
+
+        return self._cached(('year', column), calculate)
+
+    def _get_total_by_group(self, name, codes, groups, column):
+        if column not in self.runs:
+            return ScenarioResults._get_total_by_group(self, name, codes, groups, column)
+
+        totals = self.runs[column].sum_by_year(codes=codes, num_groups=len(groups))
+        return pd.DataFrame(totals, index=self._year_index(), columns=pd.Index(groups, name=name))
+
+    def get_building_counts_by_compliance_status(self):
+        if 'compliance_status' not in self.runs:
+            return ScenarioResults.get_building_counts_by_compliance_status(self)
+
+        def calculate():
+            statuses = self.runs['compliance_status']
+            counts = np.stack([statuses.count_by_year(code) for code in range(len(COMPLIANCE_STATUS_DTYPE.categories))], axis=1)
+            return pd.DataFrame(counts, index=self._year_index(), columns=pd.Index(COMPLIANCE_STATUS_DTYPE.categories, name='compliance_status'))
+
+        return self._cached('compliance_status_counts', calculate)
+
+    def _sum_all_buildings(self, column):
+        if column in self.runs:
+            return self.runs[column].sum_by_year()[:, 0]
+        return self.panel[column].sum(axis=1)
+
+    def get_percent_emissions_reduction_by_given_year(self, year, column='compliant_emissions'):
+        # every building counts here, like model_name.get_percent_emissions_reduction_by_given_year
+        baseline_by_year = self._cached(('all_buildings', 'expected_baseline'), lambda: self._sum_all_buildings('expected_baseline'))
+        emissions_by_year = self._cached(('all_buildings', column), lambda: self._sum_all_buildings(column))
+
+        # 2026 emissions are the same as the 2027 baseline
+        baseline_2026 = baseline_by_year[self.years == 2027].sum()
+        emissions_in_target_year = emissions_by_year[self.years == year].sum()
+
+        return 1 - (emissions_in_target_year / baseline_2026)
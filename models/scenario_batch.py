@@ -0,0 +1,149 @@
+import pandas as pd
+import numpy as np
+
+from baseline_model import BaselineBEPSModel
+from ghgi_target_index import GHGITargetIndex
+from schema import ID_DTYPE, YEAR_DTYPE, make_compliance_statuses
+from use_type_weights import UseTypeStandards
+
+class ScenarioBatch(BaselineBEPSModel):
+    def __init__(self, emissions_path, building_data_path, cache_dir=None):
+        '''
+        Evaluate many timelines and fine schedules against the same building and emissions data.
+        The input data is loaded once and every scenario shares the same expected baseline panel,
+        so each extra scenario only costs a GHGI target lookup.
+
+        emissions_path: file path to table of energy emissions factors for each year
+        building_data_path: file path for buildings data
+        cache_dir: optional directory to cache the loaded and cleaned input tables in
+        '''
+        BaselineBEPSModel.__init__(self, emissions_path, None, building_data_path, None, None, cache_dir)
+        self.scenarios = []
+        self._timeline_targets = {}
+
+    def _load_timeline_data(self):
+        # every scenario brings its own timeline, see add_scenario
+        pass
+
+    def add_scenario(self, name, timeline, fine_years, fine_per_sqft, ghgi_scale=1.0):
+        '''
+        name: label for the scenario in the results
+        timeline: file path or dataframe for the scenario's proposed timeline of emissions reduction
+        fine_years: array of years where building owners can be fined for not being compliant
+        fine_per_sqft: per square foot fee for non-compliance
+        ghgi_scale: multiplier for every GHGI target in the timeline, e.g. 0.8 for targets 20% below the proposal
+        '''
+        if name in [scenario['name'] for scenario in self.scenarios]:
+            raise ValueError(f'There is already a scenario named {name}')
+
+        self.scenarios.append({
+            'name': name,
+            'timeline': timeline,
+            'fine_years': fine_years,
+            'fine_per_sqft': fine_per_sqft,
+            'ghgi_scale': ghgi_scale,
+        })
+
+    def _get_timeline_targets(self, timeline):
+        '''
+        Return the GHGITargetIndex for a timeline file path or dataframe, compiling each timeline only once.
+        '''
+        key = timeline if isinstance(timeline, str) else id(timeline)
+        if key not in self._timeline_targets:
+            timeline_data = pd.read_csv(timeline) if isinstance(timeline, str) else timeline
+            self._timeline_targets[key] = GHGITargetIndex(timeline_data)
+        return self._timeline_targets[key]
+
+    def calculate_scenarios(self, start_year, end_year):
+        '''
+            start_year: year to begin calculations (inclusive)
+            end_year: year to end calculations (inclusive)
+        '''
+        if len(self.scenarios) == 0:
+            print('You need to add scenarios with the add_scenario method before calculating them')
+            return
+
+        years, ids, expected_baselines, baseline_ghgi = self._get_baseline_panel(start_year, end_year)
+        gfa = self.buildings.gfas(ids)
+
+        # standards only depend on the timeline, so scenarios that share a timeline share the lookup
+        standards_by_timeline = {}
+        for scenario in self.scenarios:
+            targets = self._get_timeline_targets(scenario['timeline'])
+            if id(targets) not in standards_by_timeline:
+                standards_by_timeline[id(targets)] = self._get_use_type_standards(years, ids, targets)
+
+        # stack to (scenario x year x building) and evaluate every scenario at once
+        standards = UseTypeStandards.stack([
+            standards_by_timeline[id(self._get_timeline_targets(scenario['timeline']))].scale(scenario['ghgi_scale']) for scenario in self.scenarios
+        ])
+
+        panel = self._get_compliance_panel(ids, baseline_ghgi, standards)
+        panel['compliance_fees'] = np.stack([
+            self._get_noncompliance_fines(years, gfa, scenario['fine_years'], scenario['fine_per_sqft']) for scenario in self.scenarios
+        ])
+
+        self.years = years.ravel()
+        self.ids = ids
+        self.expected_baselines = expected_baselines
+        self.expected_baseline_ghgis = baseline_ghgi
+        self.scenario_panel = panel
+
+        print('Scenario calculations complete. Get the results with model_name.get_scenario_results() or model_name.get_scenario_aggregates()')
+
+    # Calculating statistics about the scenarios
+
+    def get_scenario_results(self):
+        '''
+        Return a tidy dataframe with one row per scenario, year and building.
+        '''
+        names = [scenario['name'] for scenario in self.scenarios]
+        num_years, num_buildings = self.expected_baseline_ghgis.shape
+
+        output = {
+            'scenario': pd.Categorical.from_codes(np.repeat(np.arange(len(names)), num_years * num_buildings), categories=names),
+            'year': np.tile(np.repeat(self.years.astype(YEAR_DTYPE), num_buildings), len(names)),
+            'OSEBuildingID': np.tile(self.ids.astype(ID_DTYPE), len(names) * num_years),
+            'expected_baseline': np.tile(self.expected_baselines.ravel(), len(names)),
+            'expected_baseline_ghgi': np.tile(self.expected_baseline_ghgis.ravel(), len(names)),
+        }
+        for col, values in self.scenario_panel.items():
+            output[col] = make_compliance_statuses(values) if col == 'compliance_status' else values.ravel()
+
+        return pd.DataFrame(output)
+
+    def get_scenario_aggregates(self):
+        '''
+        Return total expected baseline emissions, compliant emissions and fees for each scenario and year.
+        '''
+        names = [scenario['name'] for scenario in self.scenarios]
+        num_years = len(self.years)
+
+        aggregates = pd.DataFrame({
+            'scenario': np.repeat(names, num_years),
+            'year': np.tile(self.years, len(names)),
+            'expected_baseline': np.tile(self.expected_baselines.sum(axis=1), len(names)),
+            'compliant_emissions': self.scenario_panel['compliant_emissions'].sum(axis=2).ravel(),
+            'compliance_fees': self.scenario_panel['compliance_fees'].sum(axis=2).ravel(),
+        })
+        return aggregates.set_index(['scenario', 'year'])
+
+    def get_total_emissions_by_year(self):
+        '''
+        Total compliant emissions by year, with one column per scenario.
+        '''
+        names = [scenario['name'] for scenario in self.scenarios]
+        totals = self.scenario_panel['compliant_emissions'].sum(axis=2)
+
+        self.emissions_by_year = pd.DataFrame(totals.T, index=pd.Index(self.years, name='year'), columns=names)
+        print('Emissions by year calculations complete. Access the annual emissions dataframe as model_name.emissions_by_year')
+
+    def get_percent_emissions_reduction_by_given_year(self, year):
+        '''
+        Percent reduction from the 2027 baseline in the given year, for each scenario.
+        '''
+        names = [scenario['name'] for scenario in self.scenarios]
+        baseline_2026 = self.expected_baselines[self.years == 2027].sum()
+        emissions_in_target_year = self.scenario_panel['compliant_emissions'][:, self.years == year].sum(axis=(1, 2))
+
+        return pd.Series(1 - (emissions_in_target_year / baseline_2026), index=names)
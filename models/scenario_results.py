@@ -0,0 +1,122 @@
+import pandas as pd
+import numpy as np
+
+from schema import COMPLIANCE_STATUS_DTYPE, YEAR_DTYPE
+
+class ScenarioResults:
+    def __init__(self, model, years, panel):
+        '''
+        A model's results kept as the (year x building) arrays they were calculated as.
+        Totals by year, building type, sq ft classification and compliance status are summed straight from the arrays
+        and cached, and the one row per building per year dataframe is only built when to_frame is called.
+
+        model: the BaselineBEPSModel (or subclass) the panel was calculated with
+        years: the calculated years
+        panel: dict of column name to (year x building) array, with buildings in the order of the model's building data
+        '''
+        self.model = model
+        self.years = np.asarray(years)
+        self.panel = panel
+        self.ids = model.building_data['OSEBuildingID'].to_numpy()
+        self._cache = {}
+
+    def clear_cache(self):
+        '''
+        Forget the cached totals and dataframe, e.g. after the panel's arrays were recalculated in place.
+        '''
+        self._cache = {}
+
+    def _cached(self, key, calculate):
+        if key not in self._cache:
+            self._cache[key] = calculate()
+        return self._cache[key]
+
+    def _year_index(self):
+        return pd.Index(self.years.astype(YEAR_DTYPE), name='year')
+
+    def to_frame(self):
+        '''
+        Return the full dataframe with one row per building per year, as in model_name.scenario_results
+        '''
+        return self._cached('frame', lambda: self.model._make_panel_frame(self.model.building_data, self.years, self.panel))
+
+    def get_year_values(self, column, row):
+        '''
+        Return a column's values for every building in one year, by the year's row
+        '''
+        return self.panel[column][row]
+
+    def get_total_by_year(self, column='compliant_emissions'):
+        '''
+        Return a column summed over every covered (not 'F') building in each year.
+        '''
+        def calculate():
+            is_covered = self.model.buildings.sq_ft_classes(self.ids) != 'F'
+            return pd.Series(self.panel[column][:, is_covered].sum(axis=1), index=self._year_index(), name=column)
+
+        return self._cached(('year', column), calculate)
+
+    def _get_total_by_group(self, name, codes, groups, column):
+        '''
+        Sum a column for each year and each group of buildings. codes gives each building's position in groups, -1 for none.
+        Returns a year x group dataframe.
+        '''
+        totals = np.zeros((len(self.years), len(groups)))
+        has_group = codes >= 0
+        np.add.at(totals, (slice(None), codes[has_group]), self.panel[column][:, has_group])
+        return pd.DataFrame(totals, index=self._year_index(), columns=pd.Index(groups, name=name))
+
+    def get_total_by_building_type(self, column='compliant_emissions'):
+        '''
+        Return a column summed for each OSE building type in each year, as a year x building type dataframe.
+        '''
+        def calculate():
+            buildings = self.model.buildings
+            codes = buildings.gather(buildings.building_type_codes, self.ids)
+            return self._get_total_by_group('building_type', codes, buildings.building_type_categories, column)
+
+        return self._cached(('building_type', column), calculate)
+
+    def get_total_by_sq_ft_class(self, column='compliant_emissions'):
+        '''
+        Return a column summed for each sq ft classification in each year, as a year x sq ft classification dataframe.
+        '''
+        def calculate():
+            buildings = self.model.buildings
+            codes = buildings.gather(buildings.sq_ft_class_codes, self.ids)
+            return self._get_total_by_group('sq_ft_classification', codes, buildings.sq_ft_class_categories, column)
+
+        return self._cached(('sq_ft_classification', column), calculate)
+
+    def get_total_by_compliance_status(self, column='compliant_emissions'):
+        '''
+        Return a column summed for each compliance status in each year, as a year x compliance status dataframe.
+        '''
+        def calculate():
+            statuses = self.panel['compliance_status']
+            totals = np.stack([np.where(statuses == code, self.panel[column], 0).sum(axis=1) for code in range(len(COMPLIANCE_STATUS_DTYPE.categories))], axis=1)
+            return pd.DataFrame(totals, index=self._year_index(), columns=pd.Index(COMPLIANCE_STATUS_DTYPE.categories, name='compliance_status'))
+
+        return self._cached(('compliance_status', column), calculate)
+
+    def get_building_counts_by_compliance_status(self):
+        '''
+        Return the number of buildings with each compliance status in each year.
+        '''
+        def calculate():
+            statuses = self.panel['compliance_status']
+            counts = np.stack([(statuses == code).sum(axis=1) for code in range(len(COMPLIANCE_STATUS_DTYPE.categories))], axis=1)
+            return pd.DataFrame(counts, index=self._year_index(), columns=pd.Index(COMPLIANCE_STATUS_DTYPE.categories, name='compliance_status'))
+
+        return self._cached('compliance_status_counts', calculate)
+
+    def get_percent_emissions_reduction_by_given_year(self, year, column='compliant_emissions'):
+        # every building counts here, like model_name.get_percent_emissions_reduction_by_given_year
+        baseline_by_year = self._cached(('all_buildings', 'expected_baseline'), lambda: self.panel['expected_baseline'].sum(axis=1))
+        emissions_by_year = self._cached(('all_buildings', column), lambda: self.panel[column].sum(axis=1))
+
+        # 2026 emissions are the same as the 2027 baseline
+        baseline_2026 = baseline_by_year[self.years == 2027].sum()
+        emissions_in_target_year = emissions_by_year[self.years == year].sum()
+
+        return 1 - (emissions_in_target_year / baseline_2026)
@@ -0,0 +1,65 @@
+import pandas as pd
+import numpy as np
+
+# Explicit dtypes for the model's input and result tables.
+# String dimensions are categoricals, so each value is stored once and rows only hold small integer codes.
+
+ID_DTYPE = np.int32
+YEAR_DTYPE = np.int16
+COMPLIANCE_STATUS_DTYPE = pd.CategoricalDtype(['Not due yet', 'Yes', 'No'])
+
+USE_TYPE_COLUMNS = ['LargestPropertyUseType OSE', 'SecondLargestPropertyUseType OSE', 'ThirdLargestPropertyUseType OSE']
+
+def make_category_dtype(*columns):
+    '''
+    Return a categorical dtype with every non-null value found in the given columns, sorted,
+    so tables that share a dimension also share its codes.
+    '''
+    values = set()
+    for column in columns:
+        values.update(pd.Series(column).dropna().astype(str).unique())
+    return pd.CategoricalDtype(sorted(values))
+
+def make_dimension_dtypes(building_data, timeline=None):
+    '''
+    Return the categorical dtypes shared by the building data and the timeline:
+    use types (which are the timeline's building types) and sq ft classifications.
+    '''
+    use_type_columns = [building_data[col] for col in USE_TYPE_COLUMNS]
+    sq_ft_columns = [building_data['sq_ft_classification']]
+    if timeline is not None:
+        use_type_columns.append(timeline['building_type'])
+        sq_ft_columns.append(timeline['sq_ft_classification'])
+
+    return {
+        'use_type': make_category_dtype(*use_type_columns),
+        'sq_ft_classification': make_category_dtype(*sq_ft_columns),
+    }
+
+def apply_building_schema(building_data, dimension_dtypes):
+    '''
+    Return the building data with int32 IDs and categorical use types, sq ft classifications and building types.
+    '''
+    dtypes = {col: dimension_dtypes['use_type'] for col in USE_TYPE_COLUMNS}
+    dtypes['sq_ft_classification'] = dimension_dtypes['sq_ft_classification']
+    dtypes['OSEBuildingID'] = ID_DTYPE
+    if 'OSE Building Type' in building_data.columns:
+        dtypes['OSE Building Type'] = make_category_dtype(building_data['OSE Building Type'])
+
+    return building_data.astype(dtypes)
+
+def apply_timeline_schema(timeline, dimension_dtypes):
+    '''
+    Return the timeline with int16 years and categorical building types and sq ft classifications.
+    '''
+    return timeline.astype({
+        'year': YEAR_DTYPE,
+        'building_type': dimension_dtypes['use_type'],
+        'sq_ft_classification': dimension_dtypes['sq_ft_classification'],
+    })
+
+def make_compliance_statuses(codes):
+    '''
+    Turn compliance status codes (0: Not due yet, 1: Yes, 2: No) into a categorical.
+    '''
+    return pd.Categorical.from_codes(np.asarray(codes).ravel(), dtype=COMPLIANCE_STATUS_DTYPE)
@@ -0,0 +1,99 @@
+import contextlib
+import json
+import os
+import time
+import tracemalloc
+
+import pandas as pd
+
+class StageProfiler:
+    def __init__(self, trace_memory=True, snapshot_dir=None):
+        '''
+        Record the wall time, rows processed and peak memory allocated of each stage of a model run.
+
+        trace_memory: trace allocations with tracemalloc to find each stage's peak memory. Tracing slows the run down
+        snapshot_dir: optional directory to dump a tracemalloc snapshot to at the end of each stage, for tracemalloc or other tools to compare
+        '''
+        self.trace_memory = trace_memory or snapshot_dir is not None
+        self.snapshot_dir = snapshot_dir
+        self.stages = []
+        self._open_stages = []
+        self._started_tracing = False
+
+    def _start_tracing(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        '''
+        Stop tracing allocations, if this profiler started it.
+        '''
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        '''
+        Record a stage of the run. Yields the stage's record, so the stage can fill in how many rows it processed.
+        '''
+        self._start_tracing()
+        record = {'stage': name, 'rows': None, 'wall_time_s': None, 'peak_memory_mb': None}
+        start_memory = 0
+        if self.trace_memory:
+            # reset_peak would lose the peak of the stages this one is nested in, so hand it to them first
+            peak = tracemalloc.get_traced_memory()[1]
+            for open_stage in self._open_stages:
+                open_stage['_peak'] = max(open_stage['_peak'], peak)
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        record['_start_memory'] = start_memory
+        record['_peak'] = start_memory
+
+        self._open_stages.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['wall_time_s'] = time.perf_counter() - start
+            self._open_stages.pop()
+
+            if self.trace_memory:
+                peak = max(record.pop('_peak'), tracemalloc.get_traced_memory()[1])
+                record['peak_memory_mb'] = (peak - record.pop('_start_memory')) / 2 ** 20
+                for open_stage in self._open_stages:
+                    open_stage['_peak'] = max(open_stage['_peak'], peak)
+            else:
+                record.pop('_peak')
+                record.pop('_start_memory')
+
+            if self.snapshot_dir is not None:
+                os.makedirs(self.snapshot_dir, exist_ok=True)
+                tracemalloc.take_snapshot().dump(os.path.join(self.snapshot_dir, f'{len(self.stages):03d}-{name}.snapshot'))
+
+            self.stages.append(record)
+
+    def to_frame(self):
+        '''
+        Return one row per recorded stage, in the order the stages finished.
+        '''
+        return pd.DataFrame(self.stages, columns=['stage', 'rows', 'wall_time_s', 'peak_memory_mb'])
+
+    def summary(self):
+        '''
+        Return the total wall time and rows, and the largest peak memory, of each stage, e.g. over every chunk of a chunked run.
+        '''
+        return self.to_frame().groupby('stage', sort=False).agg(
+            calls=('wall_time_s', 'size'), rows=('rows', 'sum'), wall_time_s=('wall_time_s', 'sum'), peak_memory_mb=('peak_memory_mb', 'max'),
+        )
+
+    def to_json(self, path=None):
+        '''
+        Return the recorded stages as JSON, and also write them to path if given.
+        '''
+        report = json.dumps({'stages': self.stages}, indent=2)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(report)
+        return report
@@ -0,0 +1,108 @@
+import numpy as np
+
+class TargetReductionSolver:
+    def __init__(self, model):
+        '''
+        Solve exactly for the GHGI target scale that hits a total emissions target, without re-running the model.
+
+        If every target in the timeline is multiplied by a scale s, a building's city target is
+        fixed + s * scaled, where fixed is the part held to its baseline GHGI (use types with no target yet)
+        and scaled is the part set by the timeline. Its compliant emissions are GFA * min(baseline GHGI, fixed + s * scaled),
+        so total emissions are monotone and piecewise linear in s, with a breakpoint where each building's target
+        crosses its baseline. The breakpoints are sorted once per year, and every target is then solved with a
+        binary search over the cumulative sums.
+
+        model: a BaselineBEPSModel (or subclass) with the timeline to scale
+        '''
+        self.model = model
+        self._breakpoints = {}
+
+    def _get_breakpoints(self, year):
+        '''
+        Return the sorted breakpoints for a year and, for the segment below each breakpoint,
+        the intercept and slope of total emissions as a function of scale.
+        '''
+        if year in self._breakpoints:
+            return self._breakpoints[year]
+
+        self.model._prepare_input_data()
+        ids, baseline_ghgi, standards = self.model._get_target_scale_panel(year)
+        baseline_ghgi = baseline_ghgi.ravel()
+        gfa = self.model.buildings.gfas(ids)
+
+        fixed = standards.get_baseline_shares().ravel() * baseline_ghgi
+        scaled = standards.get_target_ghgis().ravel()
+
+        # buildings whose target doesn't move with the scale contribute a constant
+        moves = scaled > 0
+        constant = (gfa[~moves] * np.minimum(baseline_ghgi[~moves], fixed[~moves])).sum()
+
+        # below its breakpoint a building emits gfa * (fixed + s * scaled), above it gfa * baseline GHGI
+        breakpoints = (baseline_ghgi[moves] - fixed[moves]) / scaled[moves]
+        order = np.argsort(breakpoints)
+        breakpoints = breakpoints[order]
+        at_baseline = (gfa * baseline_ghgi)[moves][order]
+        fixed_part = (gfa * fixed)[moves][order]
+        scaled_part = (gfa * scaled)[moves][order]
+
+        # segment k covers scales between breakpoints k - 1 and k: buildings before k are at their baseline, the rest are linear
+        intercepts = constant + np.concatenate([[0], np.cumsum(at_baseline)]) + np.concatenate([np.cumsum(fixed_part[::-1])[::-1], [0]])
+        slopes = np.concatenate([np.cumsum(scaled_part[::-1])[::-1], [0]])
+
+        self._breakpoints[year] = (breakpoints, intercepts, slopes)
+        return self._breakpoints[year]
+
+    def get_total_emissions(self, scales, year):
+        '''
+        Return total compliant emissions in a year for an array of target scales.
+        '''
+        breakpoints, intercepts, slopes = self._get_breakpoints(year)
+        scales = np.asarray(scales, dtype=float)
+        segments = np.searchsorted(breakpoints, scales, side='right')
+        return intercepts[segments] + scales * slopes[segments]
+
+    def _solve_year(self, targets_kg, year):
+        breakpoints, intercepts, slopes = self._get_breakpoints(year)
+
+        # only non-negative scales make sense, so drop the segments below 0
+        first_segment = np.searchsorted(breakpoints, 0, side='right')
+        knots = np.concatenate([[0], breakpoints[first_segment:]])
+        intercepts = intercepts[first_segment:]
+        slopes = slopes[first_segment:]
+
+        # total emissions at 0 and at every breakpoint, each evaluated on the segment that ends there
+        knot_segments = np.maximum(np.arange(len(knots)) - 1, 0)
+        totals_at_knots = intercepts[knot_segments] + knots * slopes[knot_segments]
+
+        # the first knot at or above the target closes the segment that contains it.
+        # Targets below the total at 0, or above the total once every building is at its baseline, can't be hit
+        knot = np.searchsorted(totals_at_knots, targets_kg, side='left')
+        reachable = (knot >= 1) & (knot < len(knots))
+        segments = np.clip(knot - 1, 0, len(slopes) - 1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scales = (targets_kg - intercepts[segments]) / slopes[segments]
+        scales = np.where(reachable, scales, np.nan)
+        return np.where(targets_kg == totals_at_knots[0], 0.0, scales)
+
+    def solve(self, targets_kg, target_years):
+        '''
+        Find the target scale that brings total compliant emissions in each target year to each target.
+        targets_kg and target_years broadcast against each other, so one call can solve many targets, many years, or both.
+        Returns the scales as an array (a float for scalar inputs), NaN where the target can't be hit with a non-negative scale.
+        E.g. a scale of 0.8 means every GHGI target needs to be 20% lower.
+        '''
+        targets_kg, target_years = np.broadcast_arrays(np.asarray(targets_kg, dtype=float), np.asarray(target_years, dtype=int))
+
+        scales = np.full(targets_kg.shape, np.nan)
+        for year in np.unique(target_years):
+            in_year = target_years == year
+            scales[in_year] = self._solve_year(targets_kg[in_year], int(year))
+
+        return scales if scales.ndim > 0 else float(scales)
+
+    def solve_reduction_percents(self, targets_kg, target_years):
+        '''
+        Same as solve, but returns the percent reduction of the timeline's targets, e.g. 20 when the scale is 0.8.
+        '''
+        return 100 * (1 - self.solve(targets_kg, target_years))
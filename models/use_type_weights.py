@@ -0,0 +1,208 @@
+import numpy as np
+
+def _select_rows(indptr, rows):
+    '''
+    Return the entries of the given rows of a compressed sparse row matrix, and where each row's entries start
+    among them
+    '''
+    counts = np.diff(indptr)[rows]
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+    entries = np.repeat(indptr[rows] - starts, counts) + np.arange(counts.sum())
+    return entries, starts, counts
+
+def _sum_rows(values, starts, counts):
+    '''
+    Sum (... x entry) values over each row's entries into a (... x row) array, given where each row's entries start
+    and how many there are
+    '''
+    sums = np.zeros(values.shape[:-1] + (len(counts),))
+    has_entries = counts > 0
+    if values.shape[-1] > 0:
+        sums[..., has_entries] = np.add.reduceat(values, starts[has_entries], axis=-1)
+    return sums
+
+class UseTypeWeights:
+    def __init__(self, rows, use_type_codes, shares, sq_ft_class_codes, use_type_categories, sq_ft_class_categories):
+        '''
+        Sparse (building x target key) matrix W of each building's share of GFA in each of its use types,
+        where a target key is a (sq ft classification, use type) pair, i.e. a row of the timeline in some year.
+        It is held in compressed sparse row form, so buildings can list any number of use types.
+
+        The GHGI standards are looked up once per key and year, as a (target key x year) matrix T, and gathered
+        onto W's entries (see standards), so a building's city GHGI target is the sparse product W @ T with
+        the entries of use types that have no standard yet masked to the building's baseline GHGI.
+
+        Empty use types (NaN, with no share of GFA, e.g. a building without a third largest use type) never add to
+        a target, so they aren't stored as entries. They are only remembered per building, since like any use type
+        they make the building due in the years their key has a standard.
+
+        rows: the building position of each listed use type
+        use_type_codes: each listed use type's code into use_type_categories, -1 for a listed use type that is NaN
+        shares: each listed use type's share of the building's GFA
+        sq_ft_class_codes: each building's code into sq_ft_class_categories, -1 for NaN
+        '''
+        self.num_use_types = len(use_type_categories) + 1
+        num_sq_ft_classes = len(sq_ft_class_categories) + 1
+        rows = np.asarray(rows, dtype=np.int64)
+        use_type_codes = np.asarray(use_type_codes, dtype=np.int64)
+        shares = np.asarray(shares, dtype=float)
+        sq_ft_class_codes = np.asarray(sq_ft_class_codes, dtype=np.int64)
+        self.num_buildings = len(sq_ft_class_codes)
+
+        # NaN use types and sq ft classifications get the last code, so they have keys of their own
+        is_empty = (use_type_codes < 0) & (shares == 0)
+        use_type_codes = np.where(use_type_codes >= 0, use_type_codes, self.num_use_types - 1)
+        sq_ft_class_codes = np.where(sq_ft_class_codes >= 0, sq_ft_class_codes, num_sq_ft_classes - 1)
+
+        # the key of each building's empty use type, -1 if it has none
+        has_empty_use_type = np.bincount(rows[is_empty], minlength=self.num_buildings) > 0
+        self.empty_keys = np.where(has_empty_use_type, sq_ft_class_codes * self.num_use_types + self.num_use_types - 1, -1)
+
+        order = np.flatnonzero(~is_empty)
+        order = order[np.argsort(rows[order], kind='stable')]
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(rows[order], minlength=self.num_buildings))])
+        self.use_type_codes = use_type_codes[order]
+        self.keys = sq_ft_class_codes[rows[order]] * self.num_use_types + self.use_type_codes
+        self.shares = shares[order]
+
+        # the sq ft classification and use type of each key, in key order
+        self.key_sq_ft_classes = np.repeat(np.append(sq_ft_class_categories.to_numpy(dtype=object), np.nan), self.num_use_types)
+        self.key_use_types = np.tile(np.append(use_type_categories.to_numpy(dtype=object), np.nan), num_sq_ft_classes)
+
+    @classmethod
+    def from_columns(cls, use_type_codes, shares, sq_ft_class_codes, use_type_categories, sq_ft_class_categories):
+        '''
+        Build the weights from (building x use type column) arrays, e.g. of the largest, second and third largest use types
+        '''
+        num_buildings, num_columns = use_type_codes.shape
+        rows = np.repeat(np.arange(num_buildings), num_columns)
+        return cls(rows, use_type_codes.ravel(), shares.ravel(), sq_ft_class_codes, use_type_categories, sq_ft_class_categories)
+
+    def _sum_by_building(self, values, positions):
+        entries, starts, counts = _select_rows(self.indptr, positions)
+        return _sum_rows(values[entries], starts, counts)
+
+    def get_use_type_shares(self, use_type_codes, positions=None):
+        '''
+        Return the given buildings' total share of GFA in any of the given use types.
+
+        use_type_codes: codes into use_type_categories, -1 for NaN use types
+        positions: positions of the buildings, defaults to every building
+        '''
+        positions = np.arange(self.num_buildings) if positions is None else np.asarray(positions)
+        codes = np.where(np.asarray(use_type_codes) >= 0, use_type_codes, self.num_use_types - 1)
+        return self._sum_by_building(np.isin(self.use_type_codes, codes) * self.shares, positions)
+
+    def lists_use_types(self, use_type_codes, positions=None):
+        '''
+        Return whether each of the given buildings lists any of the given use types, see get_use_type_shares
+        '''
+        positions = np.arange(self.num_buildings) if positions is None else np.asarray(positions)
+        codes = np.where(np.asarray(use_type_codes) >= 0, use_type_codes, self.num_use_types - 1)
+        return self._sum_by_building(np.isin(self.use_type_codes, codes).astype(float), positions) > 0
+
+    def standards(self, key_standards, positions=None):
+        '''
+        Return the UseTypeStandards of the given buildings.
+
+        key_standards: (target key x year) array of GHGI standards, NaN where a key has no standard yet
+        positions: positions of the buildings, defaults to every building
+        '''
+        positions = np.arange(self.num_buildings) if positions is None else np.asarray(positions)
+        entries, starts, counts = _select_rows(self.indptr, positions)
+        empty_keys = self.empty_keys[positions]
+        empty_due = (empty_keys >= 0) & ~np.isnan(key_standards[empty_keys].T)
+        return UseTypeStandards(key_standards[self.keys[entries]].T, self.shares[entries], starts, counts, empty_due)
+
+class UseTypeStandards:
+    def __init__(self, standards, shares, starts, counts, empty_due=None):
+        '''
+        The GHGI standards of every listed use type of a set of buildings, one column per nonzero entry of UseTypeWeights.
+
+        standards: (year x entry) array of GHGI standards, NaN where the use type has no standard yet.
+            May have extra leading dimensions, e.g. one per scenario
+        shares: each entry's share of its building's GFA
+        starts, counts: where each building's entries start, and how many there are
+        empty_due: optional (year x building) boolean array, True where a building's empty use type has a standard,
+            which makes it due though it has no entry for it (see UseTypeWeights). May have the same extra dimensions
+        '''
+        self.standards = standards
+        self.shares = shares
+        self.starts = starts
+        self.counts = counts
+        self.empty_due = np.zeros(standards.shape[:-1] + (len(counts),), dtype=bool) if empty_due is None else empty_due
+        self._entry_buildings = None
+
+    def _sum_entries(self, values):
+        '''
+        Sum (... x entry) values over each building's entries into a (... x building) array
+        '''
+        return _sum_rows(values, self.starts, self.counts)
+
+    def _gather_buildings(self, values):
+        '''
+        Gather (... x building) values onto each building's entries
+        '''
+        if self._entry_buildings is None:
+            self._entry_buildings = np.repeat(np.arange(len(self.counts)), self.counts)
+        return values[..., self._entry_buildings]
+
+    def get_city_ghgis(self, baseline_ghgi):
+        '''
+        Return the standards blended by GFA share, with use types that have no standard yet held to the building's baseline GHGI
+        '''
+        # built in place in one (... x entry) array, which is the largest temporary of a model run
+        values = self._gather_buildings(baseline_ghgi)
+        shape = np.broadcast_shapes(values.shape, self.standards.shape)
+        if values.shape != shape:
+            values = np.broadcast_to(values, shape).copy()
+        np.copyto(values, self.standards, where=~np.isnan(self.standards))
+        values *= self.shares
+        return self._sum_entries(values)
+
+    def get_target_ghgis(self):
+        '''
+        Return the standards blended by GFA share, counting use types with no standard yet as zero
+        '''
+        return self._sum_entries(np.nan_to_num(self.standards) * self.shares)
+
+    def get_baseline_shares(self):
+        '''
+        Return the share of each building's GFA in use types that have no standard yet
+        '''
+        return self._sum_entries(np.isnan(self.standards) * self.shares)
+
+    def is_due(self):
+        '''
+        Return True where any of a building's use types, listed or empty, has a standard
+        '''
+        return (self._sum_entries(~np.isnan(self.standards)) > 0) | self.empty_due
+
+    def scale(self, scale):
+        '''
+        Return these standards multiplied by scale
+        '''
+        return UseTypeStandards(self.standards * scale, self.shares, self.starts, self.counts, self.empty_due)
+
+    def select(self, year_rows, building_cols):
+        '''
+        Return the standards of a block of years and buildings, by position
+        '''
+        entries, starts, counts = _select_rows(np.append(self.starts, len(self.shares)), building_cols)
+        return UseTypeStandards(self.standards[np.ix_(year_rows, entries)], self.shares[entries], starts, counts, self.empty_due[np.ix_(year_rows, building_cols)])
+
+    def update(self, year_rows, building_cols, block_standards):
+        '''
+        Replace the standards of a block of years and buildings with the standards of the same block from select
+        '''
+        entries, _, _ = _select_rows(np.append(self.starts, len(self.shares)), building_cols)
+        self.standards[np.ix_(year_rows, entries)] = block_standards.standards
+        self.empty_due[np.ix_(year_rows, building_cols)] = block_standards.empty_due
+
+    @classmethod
+    def stack(cls, standards):
+        '''
+        Stack the standards of the same buildings, e.g. one per scenario, along a new leading dimension
+        '''
+        first = standards[0]
+        return cls(np.stack([scenario.standards for scenario in standards]), first.shares, first.starts, first.counts, np.stack([scenario.empty_due for scenario in standards]))
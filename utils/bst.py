@@ -1,60 +1,47 @@
-import os
-import shutil
+import pandas as pd
 
 from baseline_model import BaselineBEPSModel
+from target_reduction_solver import TargetReductionSolver
 
-# Binary search tree algorithm to determine what % reduction in target emissions is needed to hit a specific emissions target
+# Solver to determine what % reduction in target emissions is needed to hit a specific emissions target
 # Takes an emissions target, a year by which that target needs to be met, and the standard input data for the BaselineBEPSModel
 # NB: this file is not currently used in the repo
 
-# method to create temporary file for emissions
-# percent is % of original baseline, not percent reduction of original baseline
-def create_temp_emissions_timeline_file(percent, timeline_path):
+def create_scaled_emissions_timeline_file(percent, timeline_path):
     '''
-        Method to create temporary file for emissions
+        Method to save a copy of the timeline with every GHGI target scaled
         Percent is % of original baseline, not percent reduction of original baseline
         E.g., if you want to reduce the baseline by 20%, percent would be 80
     '''
     timeline = pd.read_csv(timeline_path)
     timeline['ghgi'] = timeline['ghgi'] * (percent/100.0)
-    file_name = f'tmp/timeline_{percent}_percent_of_policy.csv'
+    file_name = f'timeline_{percent}_percent_of_policy.csv'
     timeline.to_csv(file_name)
     return file_name
 
+def find_reduction_percents(targets_kg, target_years, timeline_path, emissions_path, building_data_path, fine_years, fine_per_sqft):
+    '''
+        Solve for the % reduction in the timeline's targets needed for each (target_kg, target_year) pair.
+        targets_kg and target_years broadcast against each other. Unreachable targets are NaN.
+    '''
+    model = BaselineBEPSModel(emissions_path, timeline_path, building_data_path, fine_years, fine_per_sqft)
+    return TargetReductionSolver(model).solve_reduction_percents(targets_kg, target_years)
+
 def find_reduction_percent(target_kg, target_year, timeline_path, emissions_path, building_data_path, fine_years, fine_per_sqft):
-    # make temporary directory for timeline files
-    os.mkdir('tmp')
-
-    min_emissions = target_kg - 5000
-    max_emissions = target_kg + 5000
-
-    high = 100
-    low = 0
-    found_target = False
-
-    while not found_target:
-        percent_of_orig_emissions = (high + low) / 2
-        reduced_timeline_path = create_temp_emissions_timeline_file(percent_of_orig_emissions, timeline_path)
-
-        model = BaselineBEPSModel(emissions_path, reduced_timeline_path, building_data_path, fine_years, fine_per_sqft)
-        model.calculate_baseline_model(target_year, target_year)
-        emissions_in_2040 = model.scenario_results['compliant_emissions'].sum()
-
-        if min_emissions < emissions_in_2040 < max_emissions:
-            print(f'You can achieve {target_kg} kg/yr in {target_year} by reducing the baselines by {100 - percent_of_orig_emissions}%.')
-            # move file
-            os.rename(reduced_timeline_path, reduced_timeline_path.replace('tmp/', ''))
-                      
-            # turn model into csv
-            model.scenario_results.to_csv(f'emissions_{target_year}_{percent_of_orig_emissions}_of_policy.csv')
-
-            # delete tmp directory
-            shutil.rmtree('tmp')
-
-            found_target = True
-
-        else:
-            if emissions_in_2040 < target_kg:
-                low = percent_of_orig_emissions
-            else:
-                high = percent_of_orig_emissions
\ No newline at end of file
+    model = BaselineBEPSModel(emissions_path, timeline_path, building_data_path, fine_years, fine_per_sqft)
+    scale = TargetReductionSolver(model).solve(target_kg, target_year)
+
+    if pd.isna(scale):
+        print(f'{target_kg} kg/yr in {target_year} cannot be reached by scaling the targets in this timeline.')
+        return None
+
+    percent_of_orig_emissions = scale * 100
+    print(f'You can achieve {target_kg} kg/yr in {target_year} by reducing the baselines by {100 - percent_of_orig_emissions}%.')
+
+    # save the scaled timeline and the model results for it
+    reduced_timeline_path = create_scaled_emissions_timeline_file(percent_of_orig_emissions, timeline_path)
+    reduced_model = BaselineBEPSModel(emissions_path, reduced_timeline_path, building_data_path, fine_years, fine_per_sqft)
+    reduced_model.calculate_baseline_model(target_year, target_year)
+    reduced_model.get_scenario_results_with_building_info().to_csv(f'emissions_{target_year}_{percent_of_orig_emissions}_of_policy.csv')
+
+    return 100 - percent_of_orig_emissions